@@ -12,12 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .accounts import Account, AccountPool
+from .change_catalog import ChangeCatalog
 from .clone_project import CloneProjectAction
+from .content_model import ContentModel
+from .create_account import CreateAccountAction
 from .create_project import CreateProjectAction
 from .fetch_project import FetchProjectAction
+from . import git_commands
+from . import history_generator
 from .push_for_review import PushForReviewAction
 from .push_head_to_master import PushHeadToMasterAction
 from .query_change_files import QueryChangeFilesAction
 from .query_hundred_open_changes import QueryHundredOpenChanges
 from .query_projects import QueryProjectsAction
+from .rest_request import RestRequestAction
 from .review_change import ReviewChangeAction
+from .session import create_session
+from . import trace2
+from .workspace import WorkspaceManager
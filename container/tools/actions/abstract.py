@@ -13,64 +13,190 @@
 # limitations under the License.
 
 import abc
+import asyncio
 import logging
+import random
+import time
 import traceback
 
-from datetime import datetime
+import aiohttp
+
+import metrics
+
+from .json_stream import JsonStreamParser
 
-import numpy as np
 
 # pylint: disable=W0703
 class AbstractAction(abc.ABC):
-    def __init__(self, url, user, pwd, probability=1.0):
+    def __init__(self, url, user, pwd, probability=1.0, session=None):
         self.url = url
         self.user = user
         self.pwd = pwd
         self.probability = probability
+        self.session = session
         self.was_executed = False
         self.failed = False
+        self.service_time = None
+        self.response_time = None
+        self.response_bytes = 0
+        self.response_status = None
+        # Durations in seconds of the phases of the action, e.g. of git
+        # operations, and counters, which are reported with the result
+        self.phases = dict()
+        self.counters = dict()
 
         self.log = logging.getLogger("ActionLogger")
 
-    def execute(self):
+    async def execute(self, intended_start=None):
+        # Timestamps are taken from the monotonic clock, which is also used by the
+        # event loop. If the action was scheduled for an earlier point in time,
+        # the response time includes the delay until the action was started.
         if self._is_executed():
             self.log.debug("%s STARTED", self.__class__.__name__)
 
+            metrics.start(self.__class__.__name__)
+            start = time.monotonic()
+            if intended_start is None:
+                intended_start = start
             try:
-                start = datetime.utcnow()
-                result = self._execute_action()
+                result = await self._execute_action()
                 self._log_result(
-                    duration=datetime.utcnow() - start,
+                    start=start,
+                    intended_start=intended_start,
                     message=self._create_log_message(),
                 )
                 return result
             except Exception:
                 self.failed = True
                 self._log_result(
-                    duration=datetime.utcnow() - start,
+                    start=start,
+                    intended_start=intended_start,
                     message=traceback.format_exc().replace("\n", " "),
                 )
 
         return None
 
     @abc.abstractmethod
-    def _execute_action(self):
+    async def _execute_action(self):
         pass
 
     @abc.abstractmethod
     def _create_log_message(self):
         pass
 
-    def _log_result(self, duration=0, message=""):
+    async def _request(self, method, url, accepted_status=(), **kwargs):
+        # Error responses fail the action, unless their status is accepted,
+        # e.g. because the action handles it.
+        auth = aiohttp.BasicAuth(self.user, self.pwd) if self.user else None
+        if self.session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self._send(
+                    session, method, url, accepted_status, auth=auth, **kwargs
+                )
+        return await self._send(
+            self.session, method, url, accepted_status, auth=auth, **kwargs
+        )
+
+    async def _send(self, session, method, url, accepted_status, **kwargs):
+        start = time.monotonic()
+        async with session.request(method, url, **kwargs) as response:
+            self._record_first_byte(start)
+            body = await response.read()
+            self.response_bytes += len(body)
+            self.response_status = response.status
+            if response.status >= 400 and response.status not in accepted_status:
+                raise RuntimeError("Server responded with status %d" % response.status)
+            return body
+
+    async def _request_items(self, method, url, **kwargs):
+        # Yields the items of a JSON list or object response, while the response
+        # is received, instead of reading and decoding it at once.
+        auth = aiohttp.BasicAuth(self.user, self.pwd) if self.user else None
+        if self.session is None:
+            async with aiohttp.ClientSession() as session:
+                async for item in self._stream(
+                    session, method, url, auth=auth, **kwargs
+                ):
+                    yield item
+        else:
+            async for item in self._stream(
+                self.session, method, url, auth=auth, **kwargs
+            ):
+                yield item
+
+    async def _stream(self, session, method, url, **kwargs):
+        start = time.monotonic()
+        async with session.request(method, url, **kwargs) as response:
+            self._record_first_byte(start)
+            self.response_status = response.status
+            if response.status != 200:
+                body = await response.read()
+                self.response_bytes += len(body)
+                raise RuntimeError("Server responded with status %d" % response.status)
+            parser = JsonStreamParser()
+            try:
+                async for item in parser.items(response.content):
+                    yield item
+            finally:
+                self.response_bytes += parser.received
+
+    def _record_first_byte(self, start):
+        # The time to the first byte of the first response of an action is
+        # reported as its ttfb phase.
+        if "ttfb" not in self.phases:
+            self.phases["ttfb"] = time.monotonic() - start
+
+    @staticmethod
+    async def _run_blocking(func, *args):
+        # Git operations are blocking and are run in the default executor of the
+        # event loop, so that they do not stall other simulated users.
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _log_result(self, start, intended_start, message=""):
+        end = time.monotonic()
+        self.service_time = end - start
+        self.response_time = end - intended_start
+        if self.phases or self.counters:
+            message = "%s %s" % (message, self._format_phases())
         self.log.info(
-            "%s %s %.2f %s",
+            "%s %s %.2f %.2f %s",
             self.__class__.__name__,
             "FAILED" if self.failed else "OK",
-            duration.total_seconds() * 1000,
+            self.service_time * 1000,
+            self.response_time * 1000,
             message,
         )
+        metrics.publish(
+            metrics.ActionResult(
+                action=self.__class__.__name__,
+                failed=self.failed,
+                service_time=self.service_time,
+                response_time=self.response_time,
+                timestamp=time.time(),
+                response_bytes=self.response_bytes,
+                user=metrics.USER_ID.get(),
+                stage=metrics.current_stage(),
+                account_class=metrics.ACCOUNT_CLASS.get(),
+                phases=self.phases,
+                counters=self.counters,
+            )
+        )
+
+    def _format_phases(self):
+        values = ["%s_ms=%.2f" % (k, v * 1000) for k, v in sorted(self.phases.items())]
+        values.extend("%s=%d" % (k, v) for k, v in sorted(self.counters.items()))
+        return " ".join(values)
 
     def _is_executed(self):
-        return np.random.choice(
-            (True, False), 1, p=(self.probability, 1 - self.probability)
-        )
+        return random.random() < self.probability
+
+    @staticmethod
+    def _choose(items, slot=None, popularity=None):
+        # Slots of the workload plan select items reproducibly, optionally
+        # weighted by the popularity of the items' ranks.
+        if slot is None:
+            slot = random.random()
+        if popularity:
+            return items[popularity.index(slot, len(items))]
+        return items[int(slot * len(items))]
@@ -14,36 +14,47 @@
 
 import abc
 import os
-import random
-import string
+import time
 
 import git
 
 from . import abstract
+from . import commit_synthesizer
+from . import trace2
+from .workspace import use_workspace
 
 
 class AbstractPushAction(abstract.AbstractAction):
-    def __init__(self, refspec, project_name, probability=0.2):
+    def __init__(
+        self,
+        refspec,
+        project_name,
+        content_model,
+        probability=0.2,
+        workdir="/tmp",
+        workspaces=None,
+        num_commits=None,
+    ):
         super().__init__(url=None, user=None, pwd=None, probability=probability)
         self.project_name = project_name
-        self.change_types = [self._add_file, self._modify_file, self._delete_file]
-        self.local_repo_path = os.path.join("/tmp", self.project_name)
+        self.content_model = content_model
+        self.workdir = workdir
+        self.workspaces = workspaces
+        self.local_repo_path = os.path.join(self.workdir, self.project_name)
         self.repo = git.Repo(self.local_repo_path)
         self.refspec = refspec
-        self.num_commits = random.randint(1, 5)
+        self.num_commits = num_commits or max(content_model.commits_per_push.draw(), 1)
 
     @abc.abstractmethod
-    def _prepare(self):
+    async def _prepare(self):
         pass
 
-    def _execute_action(self):
-        self.repo.git.checkout("origin/master")
-        self._prepare()
-        if os.path.exists(self.local_repo_path):
-            for _ in range(self.num_commits):
-                self._create_commit()
-            self.repo.remotes.origin.push(refspec=self.refspec)
-            self.was_executed = True
+    async def _execute_action(self):
+        async with use_workspace(self.workspaces, self.local_repo_path):
+            await self._prepare()
+            if os.path.exists(self.local_repo_path):
+                await self._run_blocking(self._commit_and_push)
+                self.was_executed = True
 
     def _create_log_message(self):
         return "Pushed %d commits to project %s using refspec %s" % (
@@ -52,59 +63,17 @@ class AbstractPushAction(abstract.AbstractAction):
             self.refspec,
         )
 
-    def _create_commit(self):
-        change_type_choice = random.choice(self.change_types)
-        change_type_choice()
-        self.repo.index.commit("%s\n\n" % self._create_random_string(16))
-
-    def _add_file(self):
-        while True:
-            file_name = self._create_random_string(8)
-            file_path = os.path.join("/tmp", self.project_name, file_name)
-            if os.path.exists(file_path):
-                continue
-            with open(file_path, "w+") as f:
-                self.log.info("Adding file %s to commit", file_name)
-                f.write(self._create_random_string(random.randint(1, 2000)))
-            self.repo.index.add([file_name])
-            break
-
-    def _modify_file(self):
-        files = self._get_files_in_repo_workdir()
-        if not files:
-            self.log.info(
-                "Repository does not contain any files yet. Adding instead of modifying"
-            )
-            self._add_file()
-            return
-        file_name = random.choice(files)
-        file_path = os.path.join("/tmp", self.project_name, file_name)
-        with open(file_path, "a+") as f:
-            self.log.info("Modifying file %s for commit", file_name)
-            f.write(self._create_random_string(random.randint(1, 2000)))
-        self.repo.index.add([file_name])
-
-    def _delete_file(self):
-        files = self._get_files_in_repo_workdir()
-        if not files:
-            self.log.info(
-                "Repository does not contain any files yet. Adding instead of deleting"
-            )
-            self._add_file()
-            return
-        file_name = random.choice(files)
-        self.log.info("Deleting file %s to commit", file_name)
-        os.remove(os.path.join("/tmp", self.project_name, file_name))
-        self.repo.index.remove([file_name])
-
-    def _get_files_in_repo_workdir(self):
-        files = list()
-        for (dirpath, _, filenames) in os.walk(os.path.join("/tmp", self.project_name)):
-            if ".git" not in dirpath:
-                files += [os.path.join(dirpath, file) for file in filenames]
-        return files
-
-    @staticmethod
-    def _create_random_string(length):
-        allowed_symbols = string.ascii_letters + string.digits
-        return "".join([random.choice(allowed_symbols) for n in range(length)])
+    def _commit_and_push(self):
+        # The commits are synthesized on top of origin/master without touching
+        # the working tree, so no checkout is required.
+        start = time.monotonic()
+        synthesizer = commit_synthesizer.get_synthesizer(self.local_repo_path)
+        head = synthesizer.create_commits(
+            "origin/master", self.num_commits, self.content_model, self.log
+        )
+        self.phases["commit_synthesis"] = time.monotonic() - start
+        with trace2.trace(self.phases, self.counters) as env:
+            with self.repo.git.custom_environment(**env):
+                self.repo.remotes.origin.push(
+                    refspec="%s:%s" % (head, self.refspec.split(":", 1)[1])
+                )
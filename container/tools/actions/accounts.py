@@ -0,0 +1,88 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from .create_account import CreateAccountAction
+
+
+class Account:
+    __slots__ = ("user", "pwd", "account_class", "groups", "created")
+
+    def __init__(self, user, pwd, account_class=None, groups=None, created=True):
+        self.user = user
+        self.pwd = pwd
+        self.account_class = account_class
+        self.groups = groups
+        self.created = created
+
+
+class AccountPool:
+    # Accounts, to which the simulated users are bound round-robin by their
+    # id. The pool consists of the configured credentials followed by accounts,
+    # which are created via REST by the first user bound to them. Without any
+    # configured accounts, all users share the account of the Gerrit user,
+    # whose results are not broken down by account class.
+    def __init__(self, test_config):
+        self.url = test_config["gerrit"]["url"]
+        self.user = test_config["gerrit"]["user"]
+        self.pwd = test_config["gerrit"]["password"]
+
+        accounts_config = test_config["accounts"]
+        self.accounts = [
+            Account(entry["user"], entry["password"], entry.get("class", "default"))
+            for entry in accounts_config["pool"]
+        ]
+        create_config = accounts_config["create"]
+        for i in range(create_config["number"]):
+            self.accounts.append(
+                Account(
+                    "%s-%05d" % (create_config["prefix"], i),
+                    create_config["password"],
+                    create_config["class"],
+                    create_config["groups"],
+                    created=False,
+                )
+            )
+        if not self.accounts:
+            self.accounts.append(Account(self.user, self.pwd))
+        self.locks = dict()
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def get(self, user_id):
+        return self.accounts[user_id % len(self.accounts)]
+
+    async def ensure_created(self, account, session=None):
+        # Users bound to the same account wait for a single creation.
+        if account.created:
+            return
+        lock = self.locks.setdefault(account.user, asyncio.Lock())
+        async with lock:
+            if account.created:
+                return
+            action = CreateAccountAction(
+                self.url,
+                self.user,
+                self.pwd,
+                account.user,
+                account.pwd,
+                groups=account.groups,
+                session=session,
+            )
+            await action.execute()
+            # A failed creation is retried by the next user bound to the
+            # account. Until then, actions of the user fail authentication.
+            account.created = not action.failed
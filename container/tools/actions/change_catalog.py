@@ -0,0 +1,171 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import time
+import urllib.parse
+
+import aiohttp
+
+from .json_stream import JsonStreamParser
+from .session import create_session
+
+
+class CatalogEntry:
+    __slots__ = ("change_id", "project", "revision", "files")
+
+    def __init__(self, change_id, project, revision, files):
+        self.change_id = change_id
+        self.project = project
+        self.revision = revision
+        self.files = files
+
+
+class CatalogView:
+    __slots__ = ("user", "pwd", "entries", "by_project", "refreshed", "refresh_task")
+
+    def __init__(self, user, pwd):
+        self.user = user
+        self.pwd = pwd
+        self.entries = list()
+        self.by_project = dict()
+        self.refreshed = None
+        self.refresh_task = None
+
+
+class ChangeCatalog:
+    # Open changes known to the simulated users of a process, ordered by their
+    # last update, so that reviews target recently active changes without
+    # querying for them. Since accounts may see different changes, the catalog
+    # keeps a view per account, which is shared by all users bound to it. Once
+    # older than the TTL, a view is refreshed in the background, while the
+    # stale entries are still served. Changes, that were closed in the
+    # meantime, drop out of the view on refresh.
+    def __init__(self, test_config):
+        self.log = logging.getLogger("ActionLogger")
+        self.url = test_config["gerrit"]["url"]
+        self.user = test_config["gerrit"]["user"]
+        self.pwd = test_config["gerrit"]["password"]
+        self.http_config = test_config["http"]
+        self.ttl = test_config["testrun"]["changeCatalog"]["ttl"]
+        self.size = test_config["testrun"]["changeCatalog"]["size"]
+        self.page_size = test_config["testrun"]["changeCatalog"]["pageSize"]
+
+        self.views = dict()
+
+    async def changes(self, projects=None, user=None, pwd=None):
+        # Returns the changes visible to the given account, which default to
+        # the Gerrit user, of the given projects, if there are any, and all
+        # visible changes otherwise.
+        if user is None:
+            user, pwd = self.user, self.pwd
+        view = self.views.get(user)
+        if view is None:
+            view = self.views[user] = CatalogView(user, pwd)
+
+        if view.refreshed is None:
+            await self._start_refresh(view)
+        elif time.monotonic() - view.refreshed > self.ttl:
+            self._start_refresh(view)
+
+        if projects:
+            ranks = sorted(
+                rank
+                for project in projects
+                for rank in view.by_project.get(project, list())
+            )
+            if ranks:
+                return [view.entries[rank] for rank in ranks]
+        return view.entries
+
+    def evict(self, change_id):
+        for view in self.views.values():
+            self._index(
+                view, [entry for entry in view.entries if entry.change_id != change_id]
+            )
+
+    def _start_refresh(self, view):
+        # Concurrent users of an account share a single refresh.
+        if view.refresh_task is None or view.refresh_task.done():
+            view.refresh_task = asyncio.ensure_future(self._refresh(view))
+        return view.refresh_task
+
+    async def _refresh(self, view):
+        try:
+            entries = await self.query("status:open", self.size, view.user, view.pwd)
+        except Exception as e:  # pylint: disable=W0703
+            # Stale entries are kept for another TTL, an empty view is
+            # refreshed again on the next access.
+            self.log.warning("Failed to refresh change catalog of %s: %s", view.user, e)
+            if view.entries:
+                view.refreshed = time.monotonic()
+            return
+
+        self._index(view, entries)
+        view.refreshed = time.monotonic()
+        self.log.debug(
+            "Refreshed change catalog of %s with %d changes", view.user, len(entries)
+        )
+
+    async def query(self, query, limit, user=None, pwd=None):
+        # Returns catalog entries of up to limit changes matching the query,
+        # that are visible to the given account or else to the Gerrit user.
+        # Changes are queried in pages, which are parsed while they are received.
+        entries = list()
+        if user is None:
+            user, pwd = self.user, self.pwd
+        auth = aiohttp.BasicAuth(user, pwd) if user else None
+        async with create_session(self.http_config) as session:
+            more_changes = True
+            while more_changes and len(entries) < limit:
+                url = (
+                    "%s/a/changes/?q=%s&n=%d&S=%d"
+                    "&o=CURRENT_REVISION&o=CURRENT_FILES"
+                    % (
+                        self.url,
+                        urllib.parse.quote(query, safe=":"),
+                        min(self.page_size, limit - len(entries)),
+                        len(entries),
+                    )
+                )
+                more_changes = False
+                async with session.get(url, auth=auth) as response:
+                    if response.status != 200:
+                        raise RuntimeError(
+                            "Server responded with status %d" % response.status
+                        )
+                    async for change in JsonStreamParser().items(response.content):
+                        entries.append(self._create_entry(change))
+                        more_changes = change.get("_more_changes", False)
+        return entries
+
+    @staticmethod
+    def _create_entry(change):
+        revision = change.get("current_revision")
+        files = change.get("revisions", dict()).get(revision, dict()).get("files")
+        return CatalogEntry(
+            change["id"],
+            change["project"],
+            revision,
+            list(files or dict()) or ["/COMMIT_MSG"],
+        )
+
+    @staticmethod
+    def _index(view, entries):
+        by_project = dict()
+        for rank, entry in enumerate(entries):
+            by_project.setdefault(entry.project, list()).append(rank)
+        view.entries = entries
+        view.by_project = by_project
@@ -12,40 +12,112 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import fcntl
 import os
 import shutil
 import stat
+import time
 
 import git
-import requests
 
 from . import abstract
+from . import trace2
+from .workspace import use_workspace
+
+CLONE_STRATEGIES = ("full", "shallow", "partial", "reference")
 
 
 class CloneProjectAction(abstract.AbstractAction):
-    def __init__(self, url, user, pwd, project_name, probability=0.02):
-        super().__init__(url, user, pwd, probability)
+    def __init__(
+        self,
+        url,
+        user,
+        pwd,
+        project_name,
+        probability=0.02,
+        workdir="/tmp",
+        session=None,
+        strategy="full",
+        depth=1,
+        blob_filter="blob:none",
+        object_pool="/tmp/loadtest/objects",
+        pool_refresh_interval=300,
+        workspaces=None,
+    ):
+        super().__init__(url, user, pwd, probability, session)
+        if strategy not in CLONE_STRATEGIES:
+            raise ValueError("Unknown clone strategy: %s" % strategy)
         self.project_name = project_name
+        self.local_repo_path = os.path.join(workdir, self.project_name)
+        self.strategy = strategy
+        self.depth = depth
+        self.blob_filter = blob_filter
+        self.pool_repo_path = os.path.join(object_pool, "%s.git" % self.project_name)
+        self.pool_refresh_interval = pool_refresh_interval
+        self.workspaces = workspaces
 
-    def _execute_action(self):
-        local_repo_path = os.path.join("/tmp", self.project_name)
-        if os.path.exists(local_repo_path):
-            shutil.rmtree(local_repo_path)
-        git.Repo.clone_from(self._assemble_url(), local_repo_path)
-        self._install_commit_hook()
+    async def _execute_action(self):
+        async with use_workspace(
+            self.workspaces, self.local_repo_path, worktree_changed=True
+        ):
+            await self._run_blocking(self._clone)
+            await self._install_commit_hook()
         self.was_executed = True
 
     def _create_log_message(self):
         return self.project_name
 
-    def _install_commit_hook(self):
-        hook_path = os.path.join("/tmp", self.project_name, ".git/hooks/commit-msg")
+    def _clone(self):
+        if os.path.exists(self.local_repo_path):
+            shutil.rmtree(self.local_repo_path)
+
+        options = dict()
+        if self.strategy == "shallow":
+            options["depth"] = self.depth
+        elif self.strategy == "partial":
+            options["filter"] = self.blob_filter
+        elif self.strategy == "reference":
+            self._update_object_pool()
+            options["reference"] = self.pool_repo_path
+        with trace2.trace(self.phases, self.counters) as env:
+            git.Repo.clone_from(
+                self._assemble_url(), self.local_repo_path, env=env, **options
+            )
+        trace2.count_received_bytes(
+            self.counters, dict(), trace2.pack_sizes(self.local_repo_path)
+        )
+
+    def _update_object_pool(self):
+        # The pool contains a bare mirror of each project, whose objects are
+        # shared by all clones of the project on this host. It is locked, since
+        # it may be used by several simulated users and processes at once.
+        os.makedirs(os.path.dirname(self.pool_repo_path), exist_ok=True)
+        with open(self.pool_repo_path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stamp_path = self.pool_repo_path + ".updated"
+            if not os.path.exists(self.pool_repo_path):
+                git.Repo.clone_from(
+                    self._assemble_url(), self.pool_repo_path, mirror=True
+                )
+            elif (
+                not os.path.exists(stamp_path)
+                or time.time() - os.path.getmtime(stamp_path)
+                > self.pool_refresh_interval
+            ):
+                git.Repo(self.pool_repo_path).remotes.origin.fetch()
+            else:
+                return
+            with open(stamp_path, "w"):
+                pass
+
+    async def _install_commit_hook(self):
+        hook_path = os.path.join(self.local_repo_path, ".git/hooks/commit-msg")
 
         url = "%s/tools/hooks/commit-msg" % self.url
-        response = requests.get(url)
+        content = await self._request("GET", url)
 
         with open(hook_path, "wb+") as f:
-            f.write(response.content)
+            f.write(content)
 
         os.chmod(hook_path, os.stat(hook_path).st_mode | stat.S_IEXEC)
 
@@ -0,0 +1,265 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import posixpath
+import random
+import subprocess
+import time
+
+from . import git_commands
+from .content_model import create_random_string
+
+SYNTHESIZED_REF = "refs/loadtest/synthesized"
+
+# Push actions are created per execution, while the file index of a repository
+# has to outlive them.
+_SYNTHESIZERS = dict()
+
+
+class FileIndex:
+    # Paths of the files in the tree of a commit. The index is built once per
+    # repository and then updated incrementally with the changes between the
+    # indexed commit and the next base commit.
+    def __init__(self):
+        self.commit = None
+        self.paths = list()
+        self.positions = dict()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return path in self.positions
+
+    def add(self, path):
+        if path not in self.positions:
+            self.positions[path] = len(self.paths)
+            self.paths.append(path)
+
+    def remove(self, path):
+        position = self.positions.pop(path)
+        last = self.paths.pop()
+        if position < len(self.paths):
+            self.paths[position] = last
+            self.positions[last] = position
+
+    def choice(self):
+        return random.choice(self.paths)
+
+    def sync(self, repo_path, commit):
+        if commit == self.commit:
+            return
+        if self.commit and commit:
+            try:
+                self._apply_diff(repo_path, commit)
+                self.commit = commit
+                return
+            except subprocess.CalledProcessError:
+                pass
+
+        self.paths = list()
+        self.positions = dict()
+        if commit:
+            output = git_commands.run(
+                repo_path, "ls-tree", "-r", "-z", "--name-only", commit
+            )
+            for path in output.split(b"\0")[:-1]:
+                self.add(path.decode())
+        self.commit = commit
+
+    def _apply_diff(self, repo_path, commit):
+        output = git_commands.run(
+            repo_path,
+            "diff-tree",
+            "-r",
+            "-z",
+            "--no-renames",
+            "--name-status",
+            self.commit,
+            commit,
+        )
+        fields = output.split(b"\0")[:-1]
+        for status, path in zip(fields[::2], fields[1::2]):
+            if status == b"A":
+                self.add(path.decode())
+            elif status == b"D" and path.decode() in self:
+                self.remove(path.decode())
+
+
+# pylint: disable=W0613
+class CommitSynthesizer:
+    # Writes commits directly into the object database of a repository using
+    # git fast-import, bypassing the working tree and the index.
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.files = FileIndex()
+        self.committer = "%s <%s>" % (
+            git_commands.config(self.repo_path, "user.name", "loadtest"),
+            git_commands.config(self.repo_path, "user.email", "loadtest@example.com"),
+        )
+        self.base = None
+        self.written = dict()
+        self.origins = dict()
+
+    def create_commits(self, base_rev, num_commits, content_model, log):
+        # Creates a series of commits on top of the base revision and returns
+        # the last commit. If the base revision does not exist yet, the first
+        # commit is a root commit.
+        self.base = self._resolve(base_rev)
+        self.files.sync(self.repo_path, self.base)
+        # Content written and paths renamed by this series of commits, so that
+        # later edits of the same files start from the right content.
+        self.written = dict()
+        self.origins = dict()
+
+        stream = list()
+        for i in range(num_commits):
+            stream.append(self._commit_header(i + 1, self.base if i == 0 else None))
+            for _ in range(max(content_model.files_per_commit.draw(), 1)):
+                stream.append(self._change(content_model, log))
+        # The synthesized ref is rewritten on every action, so its updates are
+        # generally not fast-forwards.
+        git_commands.run(
+            self.repo_path,
+            "fast-import",
+            "--quiet",
+            "--force",
+            stdin=b"".join(stream),
+        )
+
+        head = (
+            git_commands.run(self.repo_path, "rev-parse", SYNTHESIZED_REF)
+            .strip()
+            .decode()
+        )
+        self.files.commit = head
+        return head
+
+    def _commit_header(self, mark, base):
+        message = b"%s\n\nChange-Id: I%s\n" % (
+            create_random_string(16).encode(),
+            hashlib.sha1(os.urandom(20)).hexdigest().encode(),
+        )
+        header = b"commit %s\nmark :%d\ncommitter %s %d +0000\n%s" % (
+            SYNTHESIZED_REF.encode(),
+            mark,
+            self.committer.encode(),
+            time.time(),
+            git_commands.data(message),
+        )
+        if base:
+            header += b"from %s\n" % base.encode()
+        elif mark > 1:
+            header += b"from :%d\n" % (mark - 1)
+        return header
+
+    def _change(self, content_model, log):
+        change_type = content_model.change_type()
+        if change_type != "add" and not self.files:
+            log.info(
+                "Repository does not contain any files yet. Adding instead of %s",
+                change_type,
+            )
+            change_type = "add"
+        return getattr(self, "_%s" % change_type)(content_model, log)
+
+    def _add(self, content_model, log):
+        content, binary = content_model.create_file()
+        path = self._new_path(
+            content_model, create_random_string(8) + (".bin" if binary else ".txt")
+        )
+        log.info("Adding file %s to commit", path)
+        self.files.add(path)
+        return self._write(path, content)
+
+    def _modify(self, content_model, log):
+        path = self.files.choice()
+        log.info("Modifying file %s for commit", path)
+        return self._write(path, content_model.edit_file(self._read(path)))
+
+    def _delete(self, content_model, log):
+        path = self.files.choice()
+        log.info("Deleting file %s to commit", path)
+        self.files.remove(path)
+        self.written.pop(path, None)
+        return b"D %s\n" % git_commands.quote(path)
+
+    def _rename(self, content_model, log):
+        path = self.files.choice()
+        new_path = self._new_path(content_model, posixpath.basename(path))
+        log.info("Renaming file %s to %s for commit", path, new_path)
+        self.files.remove(path)
+        self.files.add(new_path)
+        if path in self.written:
+            self.written[new_path] = self.written.pop(path)
+        else:
+            self.origins[new_path] = self.origins.pop(path, path)
+        return b"R %s %s\n" % (git_commands.quote(path), git_commands.quote(new_path))
+
+    def _new_path(self, content_model, file_name):
+        # New files are preferably placed in existing directories, so that
+        # directories are shared by several files, as in real repositories.
+        depth = content_model.directory_depth.draw()
+        directories = list()
+        if self.files:
+            directories = posixpath.dirname(self.files.choice()).split("/")[:depth]
+            directories = [d for d in directories if d]
+        while len(directories) < depth:
+            directories.append(create_random_string(8))
+        while True:
+            path = posixpath.join(*directories, file_name)
+            if path not in self.files:
+                return path
+            file_name = create_random_string(8) + posixpath.splitext(file_name)[1]
+
+    def _read(self, path):
+        if path in self.written:
+            return self.written[path]
+        return git_commands.run(
+            self.repo_path,
+            "cat-file",
+            "blob",
+            "%s:%s" % (self.base, self.origins.get(path, path)),
+        )
+
+    def _write(self, path, content):
+        self.written[path] = content
+        return b"M 100644 inline %s\n%s" % (
+            git_commands.quote(path),
+            git_commands.data(content),
+        )
+
+    def _resolve(self, rev):
+        try:
+            return (
+                git_commands.run(
+                    self.repo_path, "rev-parse", "--verify", "-q", rev + "^{commit}"
+                )
+                .strip()
+                .decode()
+            )
+        except subprocess.CalledProcessError:
+            return None
+
+
+def get_synthesizer(repo_path):
+    if repo_path not in _SYNTHESIZERS:
+        _SYNTHESIZERS[repo_path] = CommitSynthesizer(repo_path)
+    return _SYNTHESIZERS[repo_path]
+
+
+def drop_synthesizer(repo_path):
+    _SYNTHESIZERS.pop(repo_path, None)
@@ -0,0 +1,110 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import os
+import random
+import string
+
+CHANGE_TYPES = ("add", "modify", "delete", "rename")
+
+# Maps random bytes to characters to create content in bulk. Text contains a
+# line break every 64 and a space every 6 characters on average.
+ALPHANUMERIC = (string.ascii_letters + string.digits).encode()
+ALPHANUMERIC_TABLE = bytes(ALPHANUMERIC[i % len(ALPHANUMERIC)] for i in range(256))
+TEXT_TABLE = b"\n" * 4 + b" " * 40 + ALPHANUMERIC_TABLE[44:]
+AVERAGE_LINE_LENGTH = 64
+
+
+def create_random_string(length):
+    return os.urandom(length).translate(ALPHANUMERIC_TABLE).decode()
+
+
+def create_text(size):
+    text = os.urandom(size).translate(TEXT_TABLE)
+    return text[:-1] + b"\n" if text else text
+
+
+def create_lines(num_lines):
+    lines = list()
+    while len(lines) < num_lines:
+        text = create_text(AVERAGE_LINE_LENGTH * (num_lines - len(lines) + 1))
+        lines.extend(text.splitlines(keepends=True))
+    return lines[:num_lines]
+
+
+def is_binary(content):
+    # Same heuristic as used by git
+    return b"\0" in content[:8000]
+
+
+class Distribution:
+    # Distribution of a non-negative integer value, which is either uniformly
+    # distributed between min and max or lognormally distributed around the
+    # median and limited to min and max.
+    def __init__(self, distribution_config):
+        self.distribution = distribution_config["distribution"]
+        self.min = distribution_config["min"]
+        self.max = distribution_config["max"]
+        self.median = distribution_config["median"]
+        self.sigma = distribution_config["sigma"]
+        if self.distribution not in ("uniform", "lognormal"):
+            raise ValueError("Unknown distribution: %s" % self.distribution)
+
+    def draw(self):
+        if self.distribution == "lognormal":
+            value = int(random.lognormvariate(math.log(self.median), self.sigma))
+            return min(max(value, self.min), self.max)
+        return random.randint(self.min, self.max)
+
+
+class ContentModel:
+    # Describes the changes created by push actions: the number of commits, the
+    # files touched by each commit and the kind and size of each change.
+    def __init__(self, content_config):
+        self.commits_per_push = Distribution(content_config["commitsPerPush"])
+        self.files_per_commit = Distribution(content_config["filesPerCommit"])
+        self.file_size = Distribution(content_config["fileSize"])
+        self.directory_depth = Distribution(content_config["directoryDepth"])
+        self.hunks_per_edit = Distribution(content_config["hunksPerEdit"])
+        self.lines_per_hunk = Distribution(content_config["linesPerHunk"])
+        self.binary_ratio = content_config["binaryRatio"]
+        self.change_type_weights = [
+            content_config["changeTypes"][change_type] for change_type in CHANGE_TYPES
+        ]
+
+    def change_type(self):
+        return random.choices(CHANGE_TYPES, weights=self.change_type_weights)[0]
+
+    def create_file(self):
+        # Returns the content of a new file and whether it is binary
+        size = self.file_size.draw()
+        if random.random() < self.binary_ratio:
+            return os.urandom(size), True
+        return create_text(size), False
+
+    def edit_file(self, content):
+        # Binary files are replaced as a whole. Text files are edited line by
+        # line, each hunk replacing some lines at a random position by new ones.
+        if is_binary(content):
+            return os.urandom(self.file_size.draw())
+        lines = content.splitlines(keepends=True)
+        if lines and not lines[-1].endswith(b"\n"):
+            lines[-1] += b"\n"
+        for _ in range(max(self.hunks_per_edit.draw(), 1)):
+            num_lines = self.lines_per_hunk.draw()
+            position = random.randint(0, len(lines))
+            num_removed = random.randint(0, min(num_lines, len(lines) - position))
+            lines[position : position + num_removed] = create_lines(num_lines)
+        return b"".join(lines)
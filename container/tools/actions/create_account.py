@@ -0,0 +1,53 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import abstract
+
+
+class CreateAccountAction(abstract.AbstractAction):
+    # Creates an account with an HTTP password as the configured Gerrit user.
+    # If the account exists already, e.g. from an earlier run, its HTTP
+    # password is set instead.
+    def __init__(
+        self, url, user, pwd, account_name, account_pwd, groups=None, session=None
+    ):
+        super().__init__(url, user, pwd, 1.0, session)
+        self.account_name = account_name
+        self.account_pwd = account_pwd
+        self.groups = groups or list()
+
+    async def _execute_action(self):
+        await self._request(
+            "PUT",
+            self._assemble_url(),
+            json={
+                "name": self.account_name,
+                "http_password": self.account_pwd,
+                "groups": self.groups,
+            },
+            accepted_status=(409,),
+        )
+        if self.response_status == 409:
+            await self._request(
+                "PUT",
+                "%s/password.http" % self._assemble_url(),
+                json={"http_password": self.account_pwd},
+            )
+        self.was_executed = True
+
+    def _create_log_message(self):
+        return self.account_name
+
+    def _assemble_url(self):
+        return "%s/a/accounts/%s" % (self.url, self.account_name)
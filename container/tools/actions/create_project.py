@@ -15,22 +15,36 @@
 import random
 import string
 
-import requests
-
 from . import abstract
 
 PROJECT_NAME_LENGTH = 16
 
 
 class CreateProjectAction(abstract.AbstractAction):
-    def __init__(self, url, user, pwd, probability=1):
-        super().__init__(url, user, pwd, probability)
-        self.project_name = self._get_random_project_name()
-
-    def _execute_action(self):
+    def __init__(
+        self,
+        url,
+        user,
+        pwd,
+        probability=1,
+        session=None,
+        project_name=None,
+        empty_commit=True,
+        exists_ok=False,
+    ):
+        super().__init__(url, user, pwd, probability, session)
+        self.project_name = project_name or self._get_random_project_name()
+        self.empty_commit = empty_commit
+        # Whether an existing project of the same name counts as success
+        self.exists_ok = exists_ok
+
+    async def _execute_action(self):
         rest_url = self._assemble_url()
-        requests.put(
-            rest_url, auth=(self.user, self.pwd), json={"create_empty_commit": "true"}
+        await self._request(
+            "PUT",
+            rest_url,
+            accepted_status=(409,) if self.exists_ok else (),
+            json={"create_empty_commit": str(self.empty_commit).lower()},
         )
         self.was_executed = True
         return self.project_name
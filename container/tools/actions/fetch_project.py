@@ -17,22 +17,35 @@ import os.path
 import git
 
 from . import abstract
+from . import trace2
+from .workspace import use_workspace
 
 # pylint: disable=W0703
 
 
 class FetchProjectAction(abstract.AbstractAction):
-    def __init__(self, project_name, probability=1):
+    def __init__(self, project_name, probability=1, workdir="/tmp", workspaces=None):
         super().__init__(url=None, user=None, pwd=None, probability=probability)
         self.project_name = project_name
+        self.local_repo_path = os.path.join(workdir, self.project_name)
+        self.workspaces = workspaces
 
-    def _execute_action(self):
-        local_repo_path = os.path.join("/tmp", self.project_name)
-        if os.path.exists(local_repo_path):
-            repo = git.Repo(local_repo_path)
-            for remote in repo.remotes:
-                remote.fetch()
+    async def _execute_action(self):
+        if os.path.exists(self.local_repo_path):
+            async with use_workspace(self.workspaces, self.local_repo_path):
+                await self._run_blocking(self._fetch)
             self.was_executed = True
 
+    def _fetch(self):
+        repo = git.Repo(self.local_repo_path)
+        packs_before = trace2.pack_sizes(self.local_repo_path)
+        with trace2.trace(self.phases, self.counters) as env:
+            with repo.git.custom_environment(**env):
+                for remote in repo.remotes:
+                    remote.fetch()
+        trace2.count_received_bytes(
+            self.counters, packs_before, trace2.pack_sizes(self.local_repo_path)
+        )
+
     def _create_log_message(self):
         return self.project_name
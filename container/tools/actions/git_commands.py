@@ -0,0 +1,47 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+
+# Helpers for the git commands run by actions and generators, which operate on
+# repositories directly instead of via GitPython, e.g. to stream objects into
+# git fast-import.
+
+
+def run(repo_path, *args, stdin=None):
+    return subprocess.run(
+        ("git",) + args,
+        cwd=repo_path,
+        input=stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    ).stdout
+
+
+def config(repo_path, key, default):
+    try:
+        return run(repo_path, "config", key).strip().decode() or default
+    except subprocess.CalledProcessError:
+        return default
+
+
+def quote(path):
+    # Quotes a path of a git fast-import command.
+    return b'"%s"' % path.replace("\\", "\\\\").replace('"', '\\"').encode()
+
+
+def data(content):
+    # Returns a data command of git fast-import with the given content.
+    return b"data %d\n%s\n" % (len(content), content)
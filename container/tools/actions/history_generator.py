@@ -0,0 +1,207 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import random
+import subprocess
+import time
+
+from . import git_commands
+from .content_model import create_random_string
+
+HISTORY_REF = "refs/heads/master"
+CHANGES_REF_PREFIX = "refs/loadtest/changes/"
+DIRECTORY_FANOUT = 16
+SECONDS_PER_COMMIT = 600
+FLUSH_SIZE = 1 << 20
+PROGRESS_INTERVAL = 10000
+
+
+class HistoryGenerator:
+    # Writes a repository of a configurable shape with a single git fast-import
+    # process: a linear history on master, in which each commit edits files of
+    # a fixed set, branches and annotated tags pointing into this history and a
+    # series of commits on top of master, which become changes when pushed for
+    # review. The series is split into batches, each ending at a ref below
+    # refs/loadtest/changes/.
+    def __init__(self, generator_config, content_model):
+        self.num_commits = max(generator_config["commits"], 1)
+        self.num_files = generator_config["files"]
+        self.num_branches = generator_config["branches"]
+        self.num_tags = generator_config["tags"]
+        self.num_changes = generator_config["changes"]
+        self.batch_size = max(generator_config["pushBatchSize"], 1)
+        self.content_model = content_model
+        self.committer = None
+
+        self.contents = dict()
+        self.paths = list()
+        self.timestamp = 0
+        self.process = None
+        self.buffer = list()
+        self.buffered = 0
+
+    def generate(self, repo_path, log):
+        os.makedirs(repo_path, exist_ok=True)
+        git_commands.run(repo_path, "init", "-q", "--bare")
+        self.committer = "%s <%s>" % (
+            git_commands.config(repo_path, "user.name", "loadtest"),
+            git_commands.config(repo_path, "user.email", "loadtest@example.com"),
+        )
+        self.timestamp = int(time.time()) - SECONDS_PER_COMMIT * (
+            self.num_commits + self.num_changes
+        )
+        self.process = subprocess.Popen(
+            ("git", "fast-import", "--quiet"), cwd=repo_path, stdin=subprocess.PIPE
+        )
+        try:
+            self._write_history(log)
+            self._write_refs()
+            self._write_changes()
+            self._flush()
+        finally:
+            self.process.stdin.close()
+            self.process.wait()
+        if self.process.returncode != 0:
+            raise subprocess.CalledProcessError(self.process.returncode, "fast-import")
+
+    def _write_history(self, log):
+        # The root commit adds all files, later commits only edit them, so that
+        # the size of the tree stays the same across the history.
+        self._commit(HISTORY_REF, 1, message=self._message())
+        for i in range(self.num_files):
+            depth = self.content_model.directory_depth.draw()
+            content, binary = self.content_model.create_file()
+            path = "/".join(
+                ["dir%02d" % random.randrange(DIRECTORY_FANOUT) for _ in range(depth)]
+                + ["file%07d%s" % (i, ".bin" if binary else ".txt")]
+            )
+            self.paths.append(path)
+            self._modify(path, content)
+
+        for mark in range(2, self.num_commits + 1):
+            self._commit(HISTORY_REF, mark, message=self._message(), parent=mark - 1)
+            self._edit_files()
+            if mark % PROGRESS_INTERVAL == 0:
+                log.info("Generated %d of %d commits", mark, self.num_commits)
+
+    def _write_refs(self):
+        for i in range(self.num_branches):
+            self._append(
+                b"reset refs/heads/branch-%05d\nfrom :%d\n\n"
+                % (i, random.randint(1, self.num_commits))
+            )
+        marks = sorted(
+            random.randint(1, self.num_commits) for _ in range(self.num_tags)
+        )
+        for i, mark in enumerate(marks):
+            self._append(
+                b"tag v%05d\nfrom :%d\ntagger %s %d +0000\n%s"
+                % (
+                    i,
+                    mark,
+                    self.committer.encode(),
+                    self.timestamp,
+                    git_commands.data(b"Release %05d\n" % i),
+                )
+            )
+
+    def _write_changes(self):
+        # Each commit of the series carries a Change-Id, so that it becomes a
+        # change of its own when pushed to refs/for/master.
+        for i in range(self.num_changes):
+            mark = self.num_commits + i + 1
+            batch = i // self.batch_size
+            ref = "%s%05d" % (CHANGES_REF_PREFIX, batch)
+            message = self._message() + b"\nChange-Id: I%s\n" % (
+                hashlib.sha1(os.urandom(20)).hexdigest().encode()
+            )
+            # The first commit of each batch continues the series of the last.
+            self._commit(
+                ref,
+                mark,
+                message=message,
+                parent=mark - 1 if i % self.batch_size == 0 else None,
+            )
+            self._edit_files()
+
+    def _commit(self, ref, mark, message, parent=None):
+        self.timestamp += SECONDS_PER_COMMIT
+        header = b"commit %s\nmark :%d\ncommitter %s %d +0000\n%s" % (
+            ref.encode(),
+            mark,
+            self.committer.encode(),
+            self.timestamp,
+            git_commands.data(message),
+        )
+        if parent:
+            header += b"from :%d\n" % parent
+        self._append(header)
+
+    def _edit_files(self):
+        if not self.paths:
+            return
+        for _ in range(max(self.content_model.files_per_commit.draw(), 1)):
+            path = random.choice(self.paths)
+            self._modify(path, self.content_model.edit_file(self.contents[path]))
+
+    def _modify(self, path, content):
+        self.contents[path] = content
+        self._append(
+            b"M 100644 inline %s\n%s"
+            % (git_commands.quote(path), git_commands.data(content))
+        )
+
+    def _append(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        self.process.stdin.write(b"".join(self.buffer))
+        self.buffer = list()
+        self.buffered = 0
+
+    @staticmethod
+    def _message():
+        return b"%s\n" % create_random_string(16).encode()
+
+
+def changes_refs(repo_path):
+    output = git_commands.run(
+        repo_path, "for-each-ref", "--format=%(refname)", CHANGES_REF_PREFIX
+    )
+    return output.decode().split()
+
+
+def describe(repo_path):
+    sizes = dict(
+        line.split(": ")
+        for line in git_commands.run(repo_path, "count-objects", "-v")
+        .decode()
+        .splitlines()
+    )
+    commits = (
+        git_commands.run(repo_path, "rev-list", "--count", "--all").decode().strip()
+    )
+    refs = git_commands.run(repo_path, "for-each-ref", "--format=%(refname)").count(
+        b"\n"
+    )
+    return "%s commits, %d refs, %.1f MiB packed" % (
+        commits,
+        refs,
+        int(sizes["size-pack"]) / 1024,
+    )
@@ -0,0 +1,212 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import codecs
+import json
+import re
+
+JSON_PREFIX = ")]}'"
+WHITESPACE = " \t\n\r"
+DELIMITERS = WHITESPACE + ",:]}"
+NUMBER_START = "-0123456789"
+# Characters, that may end a container or a string, outside and inside of strings
+STRUCTURE_PATTERN = re.compile(r'["\[\]{}]')
+STRING_PATTERN = re.compile(r'["\\]')
+
+
+class JsonStreamParser:
+    # Incrementally parses a JSON list or object, as it is returned by the REST
+    # API of Gerrit, from the chunks of the response body. Each item is returned
+    # as soon as it was received completely, i.e. the values of a list and the
+    # (key, value) pairs of an object, so that neither the body nor the whole
+    # document have to be kept in memory.
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.state = "prefix"
+        self.closing = None
+        self.received = 0
+        # Scan state of a container or string, that was not completely received
+        self.value_start = None
+        self.scanned = None
+        self.depth = 0
+        self.in_string = False
+
+    async def items(self, stream):
+        # Yields the items from a stream of the body, e.g. of an aiohttp response.
+        async for chunk in stream.iter_any():
+            for item in self.feed(chunk):
+                yield item
+        for item in self.close():
+            yield item
+
+    def feed(self, chunk):
+        self.received += len(chunk)
+        self.buffer += self.text_decoder.decode(chunk)
+        return self._parse(final=False)
+
+    def close(self):
+        self.buffer += self.text_decoder.decode(b"", final=True)
+        items = self._parse(final=True)
+        if self.state != "done":
+            raise ValueError("Incomplete JSON response")
+        return items
+
+    def _parse(self, final):
+        items = list()
+        position = self._skip_whitespace(0)
+        while position < len(self.buffer):
+            if self.state == "done":
+                raise ValueError("Unexpected data after JSON document")
+            end = self._step(position, final, items)
+            if end is None:
+                break
+            position = self._skip_whitespace(end)
+        self.buffer = self.buffer[position:]
+        if self.value_start is not None:
+            self.value_start -= position
+            self.scanned -= position
+        return items
+
+    def _step(self, position, final, items):
+        # Parses the token or item at the position and returns the position after
+        # it, or None, if it was not completely received yet.
+        char = self.buffer[position]
+        if self.state == "prefix":
+            # The prefix protecting against XSSI is optional.
+            rest = self.buffer[position : position + len(JSON_PREFIX)]
+            if (
+                not final
+                and len(rest) < len(JSON_PREFIX)
+                and JSON_PREFIX.startswith(rest)
+            ):
+                return None
+            self.state = "start"
+            return position + len(JSON_PREFIX) if rest == JSON_PREFIX else position
+        if self.state == "start":
+            if char not in "[{":
+                raise ValueError("Expected a JSON list or object")
+            self.closing = "]" if char == "[" else "}"
+            self.state = "first"
+            return position + 1
+        if self.state == "separator":
+            if char == ",":
+                self.state = "item"
+            elif char == self.closing:
+                self.state = "done"
+            else:
+                raise ValueError("Expected ',' or '%s'" % self.closing)
+            return position + 1
+        if self.state == "first" and char == self.closing:
+            self.state = "done"
+            return position + 1
+
+        item, end = self._decode_item(position, final)
+        if end is not None:
+            items.append(item)
+            self.state = "separator"
+        return end
+
+    def _decode_item(self, position, final):
+        # Returns the item starting at the position and the position after it,
+        # or None, if the item was not completely received yet.
+        if self.closing == "]":
+            return self._decode_value(position, final)
+        key, end = self._decode_value(position, final)
+        if end is None:
+            return None, None
+        end = self._skip_whitespace(end)
+        if end == len(self.buffer):
+            return None, None
+        if self.buffer[end] != ":" or not isinstance(key, str):
+            raise ValueError("Expected a key of a JSON object")
+        value, end = self._decode_value(self._skip_whitespace(end + 1), final)
+        if end is None:
+            return None, None
+        return (key, value), end
+
+    def _decode_value(self, position, final):
+        # Containers and strings are only decoded once they were completely
+        # received, so that large items are not decoded again for each chunk.
+        if position == len(self.buffer):
+            if final:
+                raise ValueError("Expected a JSON value")
+            return None, None
+        if self.buffer[position] in '[{"':
+            end = self._scan_value(position)
+            if end is None:
+                return None, None
+            return self.decoder.raw_decode(self.buffer, position)
+
+        # Numbers are only complete, if they are followed by a delimiter, since
+        # e.g. "2.5" would otherwise be decoded as 2, if only "2." was received.
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, position)
+        except ValueError:
+            if final:
+                raise
+            return None, None
+        if (
+            not final
+            and self.buffer[position] in NUMBER_START
+            and (end == len(self.buffer) or self.buffer[end] not in DELIMITERS)
+        ):
+            return None, None
+        return value, end
+
+    def _scan_value(self, position):
+        # Returns the position after the container or string starting at the
+        # position, or None, if it was not completely received yet. Scanning
+        # continues where it stopped in the previous chunk.
+        if self.value_start != position:
+            self.value_start = position
+            self.scanned = position
+            self.depth = 0
+            self.in_string = False
+        index = self.scanned
+        while True:
+            pattern = STRING_PATTERN if self.in_string else STRUCTURE_PATTERN
+            match = pattern.search(self.buffer, index)
+            if match is None:
+                self.scanned = len(self.buffer)
+                return None
+            index = match.start()
+            char = self.buffer[index]
+            if char == "\\":
+                # The escaped character may still be missing.
+                if index + 1 == len(self.buffer):
+                    self.scanned = index
+                    return None
+                index += 2
+                continue
+            index += 1
+            if char == '"':
+                self.in_string = not self.in_string
+                if self.in_string or self.depth:
+                    continue
+            elif char in "[{":
+                self.depth += 1
+                continue
+            else:
+                self.depth -= 1
+                if self.depth:
+                    continue
+            self.value_start = None
+            return index
+
+    def _skip_whitespace(self, position):
+        while position < len(self.buffer) and self.buffer[position] in WHITESPACE:
+            position += 1
+        return position
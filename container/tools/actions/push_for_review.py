@@ -16,8 +16,14 @@ from . import abstract_push
 
 
 class PushForReviewAction(abstract_push.AbstractPushAction):
-    def __init__(self, project_name, probability=1):
-        super().__init__("HEAD:refs/for/master", project_name, probability=probability)
+    def __init__(self, project_name, content_model, probability=1, **kwargs):
+        super().__init__(
+            "HEAD:refs/for/master",
+            project_name,
+            content_model,
+            probability=probability,
+            **kwargs
+        )
 
-    def _prepare(self):
+    async def _prepare(self):
         pass
@@ -17,9 +17,17 @@ from .fetch_project import FetchProjectAction
 
 
 class PushHeadToMasterAction(abstract_push.AbstractPushAction):
-    def __init__(self, project_name, probability=1):
-        super().__init__("HEAD:master", project_name, probability=probability)
+    def __init__(self, project_name, content_model, probability=1, **kwargs):
+        super().__init__(
+            "HEAD:master",
+            project_name,
+            content_model,
+            probability=probability,
+            **kwargs
+        )
 
-    def _prepare(self):
-        action = FetchProjectAction(self.project_name, 1.0)
-        action.execute()
+    async def _prepare(self):
+        action = FetchProjectAction(
+            self.project_name, 1.0, workdir=self.workdir, workspaces=self.workspaces
+        )
+        await action.execute()
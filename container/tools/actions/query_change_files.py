@@ -14,21 +14,28 @@
 
 import json
 
-import requests
-
 from . import abstract
 
 
 class QueryChangeFilesAction(abstract.AbstractAction):
-    def __init__(self, url, user, pwd, change_id, revision_id="current", probability=1):
-        super().__init__(url, user, pwd, probability)
+    def __init__(
+        self,
+        url,
+        user,
+        pwd,
+        change_id,
+        revision_id="current",
+        probability=1,
+        session=None,
+    ):
+        super().__init__(url, user, pwd, probability, session)
         self.change_id = change_id
         self.revision_id = revision_id
         self.files = list()
 
-    def _execute_action(self):
-        response = requests.get(self._assemble_url(), auth=(self.user, self.pwd))
-        self.files = list(json.loads(response.text.split("\n", 1)[1]).keys())
+    async def _execute_action(self):
+        response = await self._request("GET", self._assemble_url())
+        self.files = list(json.loads(response.split(b"\n", 1)[1]).keys())
         return self.files
 
     def _create_log_message(self):
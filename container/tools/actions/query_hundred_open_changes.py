@@ -12,24 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
-import random
-
-import requests
-
 from . import abstract
 
 
 class QueryHundredOpenChanges(abstract.AbstractAction):
-    def __init__(self, url, user, pwd, probability=1.0):
-        super().__init__(url, user, pwd, probability=probability)
+    def __init__(
+        self, url, user, pwd, probability=1.0, session=None, slot=None, popularity=None
+    ):
+        super().__init__(url, user, pwd, probability=probability, session=session)
         self.change = dict()
+        self.slot = slot
+        self.popularity = popularity
 
-    def _execute_action(self):
-        rest_url = self._assemble_url()
-        response = requests.get(rest_url, auth=(self.user, self.pwd))
+    async def _execute_action(self):
+        changes = [
+            change async for change in self._request_items("GET", self._assemble_url())
+        ]
         self.was_executed = True
-        self.change = random.choice(json.loads(response.text.split("\n", 1)[1]))
+        self.change = self._choose(changes, self.slot, self.popularity)
         return self.change
 
     def _create_log_message(self):
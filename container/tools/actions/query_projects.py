@@ -12,33 +12,53 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
-import random
-
-import requests
-
 from . import abstract
 
 DISALLOWED_PROJECTS = ["All-Projects", "All-Users"]
 
 
 class QueryProjectsAction(abstract.AbstractAction):
-    def __init__(self, url, user, pwd, probability=1.0):
-        super().__init__(url, user, pwd, probability=probability)
+    # Lists projects in pages of page_size projects, up to max_pages pages
+    # (0: all), like a client browsing the project list.
+    def __init__(
+        self,
+        url,
+        user,
+        pwd,
+        probability=1.0,
+        session=None,
+        slot=None,
+        page_size=500,
+        max_pages=0,
+    ):
+        super().__init__(url, user, pwd, probability=probability, session=session)
         self.selected_project = None
+        self.slot = slot
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages = 0
 
-    def _execute_action(self):
-        rest_url = self._assemble_url()
-        response = requests.get(rest_url, auth=(self.user, self.pwd))
+    async def _execute_action(self):
+        projects = list()
+        start = 0
+        while True:
+            count = 0
+            async for project, _ in self._request_items(
+                "GET", self._assemble_url(start)
+            ):
+                count += 1
+                if project not in DISALLOWED_PROJECTS:
+                    projects.append(project)
+            self.pages += 1
+            start += count
+            if count < self.page_size or self.pages == self.max_pages:
+                break
         self.was_executed = True
-        projects = list(json.loads(response.text.split("\n", 1)[1]).keys())
-        for project in DISALLOWED_PROJECTS:
-            projects.remove(project)
-        self.selected_project = random.choice(projects)
+        self.selected_project = self._choose(projects, self.slot)
         return self.selected_project
 
     def _create_log_message(self):
-        return self.selected_project
+        return "%s pages=%d" % (self.selected_project, self.pages)
 
-    def _assemble_url(self):
-        return "%s/a/projects/?d" % (self.url)
+    def _assemble_url(self, start):
+        return "%s/a/projects/?n=%d&S=%d" % (self.url, self.page_size, start)
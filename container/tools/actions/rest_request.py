@@ -0,0 +1,35 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import abstract
+
+
+class RestRequestAction(abstract.AbstractAction):
+    # Sends an arbitrary request, e.g. one replayed from a Gerrit httpd_log, that
+    # is not covered by a dedicated action.
+    def __init__(self, url, user, pwd, method, path, probability=1.0, session=None):
+        super().__init__(url, user, pwd, probability=probability, session=session)
+        self.method = method
+        self.path = path
+
+    async def _execute_action(self):
+        # Replayed requests may well have failed with a client error in
+        # production, thus only server errors fail the action.
+        await self._request(
+            self.method, self.url + self.path, accepted_status=range(400, 500)
+        )
+        self.was_executed = True
+
+    def _create_log_message(self):
+        return "%s %s %s" % (self.method, self.path, self.response_status)
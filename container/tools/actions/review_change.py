@@ -14,54 +14,77 @@
 
 import random
 
-import requests
-
 from . import abstract
-from .query_hundred_open_changes import QueryHundredOpenChanges
-from .query_change_files import QueryChangeFilesAction
 
-# pylint: disable=W0703
+
 class ReviewChangeAction(abstract.AbstractAction):
-    def __init__(self, url, user, pwd, probability=1):
-        super().__init__(url, user, pwd, probability)
-        self.change_id = None
-        self.revision_id = 1
+    # Reviews the current patch set of the given change or of a change of the
+    # shared change catalog visible to the user, preferring changes of the
+    # given projects, e.g. those the simulated user works on.
+    def __init__(
+        self,
+        url,
+        user,
+        pwd,
+        change_catalog,
+        probability=1,
+        session=None,
+        slot=None,
+        popularity=None,
+        projects=None,
+        change=None,
+    ):
+        super().__init__(url, user, pwd, probability, session)
+        self.change_catalog = change_catalog
+        self.slot = slot
+        self.popularity = popularity
+        self.projects = projects
+        self.change = change
 
-    def _execute_action(self):
-        self.change_id = self._get_change_id()
-        rest_url = self._assemble_review_url()
-        requests.post(rest_url, auth=(self.user, self.pwd), json=self._assemble_body())
+    async def _execute_action(self):
+        if self.change is None:
+            changes = await self.change_catalog.changes(
+                self.projects, self.user, self.pwd
+            )
+            if not changes:
+                raise RuntimeError("No open changes to review")
+            self.change = self._choose(changes, self.slot, self.popularity)
+        # Other errors, e.g. a change not visible to the user (403), fail the
+        # review without evicting the change.
+        await self._request(
+            "POST",
+            self._assemble_review_url(),
+            accepted_status=(404, 409),
+            json=self._assemble_body(),
+        )
         self.was_executed = True
+        if self.response_status in (404, 409):
+            # The change was deleted or closed since the catalog was refreshed.
+            self.change_catalog.evict(self.change.change_id)
+            raise RuntimeError(
+                "Change %s is no longer open (status %d)"
+                % (self.change.change_id, self.response_status)
+            )
 
     def _create_log_message(self):
-        return self.change_id
-
-    def _get_change_id(self):
-        try:
-            return QueryHundredOpenChanges(
-                self.url, self.user, self.pwd, 1.0
-            ).execute()["change_id"]
-        except Exception:
-            return None
+        return "%s %s" % (self.change.change_id, self.change.revision)
 
     def _assemble_review_url(self):
         return "%s/a/changes/%s/revisions/%s/review" % (
             self.url,
-            self.change_id,
-            self.revision_id,
+            self.change.change_id,
+            self.change.revision or "current",
         )
 
     def _assemble_body(self):
-        file_to_comment = random.choice(self._list_files())
-        label = random.randint(-2, 2)
+        # The comment and the vote are derived from the slot of the workload
+        # plan, so that runs with the same seed post the same reviews.
+        rng = random if self.slot is None else random.Random(self.slot)
+        file_to_comment = rng.choice(self.change.files)
+        label = rng.randint(-2, 2)
         return {
             "tag": "loadtest",
             "message": "Yet another comment.",
             "labels": {"Code-Review": label},
             "comments": {file_to_comment: [{"line": 1, "message": "Gibberish!"}]},
         }
-
-    def _list_files(self):
-        return QueryChangeFilesAction(
-            self.url, self.user, self.pwd, self.change_id, probability=1.0
-        ).execute()
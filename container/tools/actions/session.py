@@ -0,0 +1,28 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import aiohttp
+
+
+def create_session(http_config):
+    if http_config["newConnectionPerRequest"]:
+        connector = aiohttp.TCPConnector(
+            limit=http_config["poolSize"], force_close=True
+        )
+    else:
+        connector = aiohttp.TCPConnector(
+            limit=http_config["poolSize"],
+            keepalive_timeout=http_config["keepAliveTimeout"],
+        )
+    return aiohttp.ClientSession(connector=connector)
@@ -0,0 +1,127 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import glob
+import json
+import os
+import shutil
+import tempfile
+
+# Regions of the trace2 events of git, whose durations are summed up as phases
+# of a git operation, by (category, label)
+REGION_PHASES = {
+    ("fetch", "remote_refs"): "ref_advertisement",
+    ("transport_push", "get_refs_list"): "ref_advertisement",
+    ("fetch-pack", "negotiation_v0_v1"): "negotiation",
+    ("fetch-pack", "negotiation_v2"): "negotiation",
+    ("pack-objects", "enumerate-objects"): "pack_generation",
+    ("pack-objects", "prepare-pack"): "pack_generation",
+    ("pack-objects", "write-pack-file"): "pack_generation",
+    ("transport_push", "push_refs"): "push_refs",
+    ("unpack_trees", "unpack_trees"): "checkout",
+    ("index", "do_write_index"): "index_write",
+}
+
+# Child processes, whose durations are summed up as phases, by git command
+CHILD_PHASES = {
+    "index-pack": "pack_receive",
+    "unpack-objects": "pack_receive",
+    "rev-list": "connectivity_check",
+}
+
+# Data events, whose values are summed up as counters, by (category, key)
+DATA_COUNTERS = {
+    ("negotiation_v0_v1", "total_rounds"): "negotiation_rounds",
+    ("negotiation_v2", "total_rounds"): "negotiation_rounds",
+    ("pack-objects", "write_pack_file/wrote"): "objects_sent",
+    ("index", "write/cache_nr"): "index_entries",
+}
+
+_ENABLED = True
+
+
+def set_enabled(enabled):
+    global _ENABLED  # pylint: disable=W0603
+    _ENABLED = enabled
+
+
+@contextlib.contextmanager
+def trace(phases, counters):
+    # Yields the environment, with which git processes write their trace2
+    # events to a temporary directory, one file per process. Afterwards, the
+    # phases and counters of the events are added to the given dictionaries.
+    if not _ENABLED:
+        yield dict()
+        return
+    directory = tempfile.mkdtemp(prefix="loadtest-trace2-")
+    try:
+        yield {"GIT_TRACE2_EVENT": directory}
+        for path in glob.glob(os.path.join(directory, "*")):
+            with open(path, "r") as f:
+                _parse_events(f, phases, counters)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def pack_sizes(repo_path):
+    sizes = dict()
+    for path in glob.glob(os.path.join(repo_path, ".git", "objects", "pack", "*.pack")):
+        try:
+            sizes[path] = os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+    return sizes
+
+
+def count_received_bytes(counters, packs_before, packs_after):
+    # Received packs are kept as new pack files, unless they contain only a few
+    # objects, which are unpacked into loose objects instead.
+    received = sum(
+        size for path, size in packs_after.items() if path not in packs_before
+    )
+    counters["pack_bytes_received"] = counters.get("pack_bytes_received", 0) + received
+
+
+def _parse_events(lines, phases, counters):
+    children = dict()
+    for line in lines:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        name = event.get("event")
+        if name == "region_leave":
+            phase = REGION_PHASES.get((event.get("category"), event.get("label")))
+            if phase:
+                _add(phases, phase, event["t_rel"])
+        elif name == "child_start":
+            argv = event.get("argv") or [""]
+            command = argv[1] if argv[0] == "git" and len(argv) > 1 else argv[0]
+            children[event["child_id"]] = command
+        elif name == "child_exit":
+            phase = CHILD_PHASES.get(children.get(event["child_id"]))
+            if phase:
+                _add(phases, phase, event["t_rel"])
+        elif name == "data":
+            counter = DATA_COUNTERS.get((event.get("category"), event.get("key")))
+            if counter:
+                try:
+                    _add(counters, counter, int(event["value"]))
+                except ValueError:
+                    pass
+
+
+def _add(values, key, value):
+    values[key] = values.get(key, 0) + value
@@ -0,0 +1,154 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import contextlib
+import logging
+import os
+import shutil
+
+from . import commit_synthesizer
+
+TMPFS = "/dev/shm"
+
+
+class Workspace:
+    def __init__(self):
+        self.users = 0
+        self.worktree_size = 0
+        self.git_size = 0
+
+    @property
+    def size(self):
+        return self.worktree_size + self.git_size
+
+
+class WorkspaceManager:
+    # Keeps track of the disk usage of the repositories cloned by the simulated
+    # users of this process. If the total size exceeds the budget, the least
+    # recently used repositories, which are not in use, are deleted and their
+    # listeners are notified, so that the projects are no longer sampled.
+    def __init__(self, workspace_config):
+        self.log = logging.getLogger("ActionLogger")
+        self.root = workspace_config["directory"]
+        if workspace_config["tmpfs"]:
+            if os.path.isdir(TMPFS):
+                self.root = os.path.join(TMPFS, "loadtest")
+            else:
+                self.log.info(
+                    "%s is not available. Using %s for workspaces", TMPFS, self.root
+                )
+        self.budget = workspace_config["budget"] * 1024 * 1024
+        self.workspaces = collections.OrderedDict()
+        self.listeners = list()
+        self.evictions = 0
+
+    @property
+    def size(self):
+        return sum(workspace.size for workspace in self.workspaces.values())
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def acquire(self, path):
+        if path not in self.workspaces:
+            self.workspaces[path] = Workspace()
+        self.workspaces.move_to_end(path)
+        self.workspaces[path].users += 1
+
+    async def release(self, path, worktree_changed=False):
+        # The working tree only changes when a project is cloned, so that later
+        # uses only have to measure the git directory.
+        workspace = self.workspaces[path]
+        loop = asyncio.get_event_loop()
+        if worktree_changed:
+            workspace.worktree_size = await loop.run_in_executor(
+                None, _disk_usage, path, ".git"
+            )
+        workspace.git_size = await loop.run_in_executor(
+            None, _disk_usage, os.path.join(path, ".git")
+        )
+        workspace.users -= 1
+        if not workspace.users and not workspace.size:
+            del self.workspaces[path]
+        await self._evict()
+
+    async def discard(self, path):
+        # Deletes a repository, that is no longer needed.
+        self.workspaces.pop(path, None)
+        commit_synthesizer.drop_synthesizer(path)
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, shutil.rmtree, path, True)
+
+    async def _evict(self):
+        if not self.budget:
+            return
+        size = self.size
+        victims = list()
+        for path, workspace in self.workspaces.items():
+            if size <= self.budget:
+                break
+            if not workspace.users:
+                victims.append(path)
+                size -= workspace.size
+        if not victims:
+            return
+
+        # The projects are dropped from the sampling pools before their
+        # repositories are deleted, so that no action starts to use them.
+        for path in victims:
+            del self.workspaces[path]
+            commit_synthesizer.drop_synthesizer(path)
+            for listener in self.listeners:
+                listener(path)
+        self.evictions += len(victims)
+        self.log.info(
+            "Evicted %d workspaces to keep %.1f MiB within budget of %.1f MiB",
+            len(victims),
+            size / 1024 / 1024,
+            self.budget / 1024 / 1024,
+        )
+        loop = asyncio.get_event_loop()
+        for path in victims:
+            await loop.run_in_executor(None, shutil.rmtree, path, True)
+
+
+@contextlib.asynccontextmanager
+async def use_workspace(manager, path, worktree_changed=False):
+    if manager is None:
+        yield
+        return
+    manager.acquire(path)
+    try:
+        yield
+    finally:
+        await manager.release(path, worktree_changed)
+
+
+def _disk_usage(path, exclude=None):
+    # Allocated size of all files in the directory tree in bytes
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        if dirpath == path and exclude in dirnames:
+            dirnames.remove(exclude)
+        for name in filenames + dirnames:
+            try:
+                size += os.lstat(os.path.join(dirpath, name)).st_blocks * 512
+            except FileNotFoundError:
+                pass
+    return size
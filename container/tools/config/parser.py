@@ -20,24 +20,175 @@ from .helper_dict import left_outer_join
 
 DEFAULTS = {
     "gerrit": {"url": None, "user": "admin", "password": "secret"},
+    "http": {"poolSize": 6, "keepAliveTimeout": 15, "newConnectionPerRequest": False},
     "testrun": {
         "duration": None,
+        "mode": "closed",
+        "users": 1,
+        "gitWorkers": 8,
+        "workspace": {"directory": "/tmp/loadtest", "tmpfs": False, "budget": 10240},
+        "changeCatalog": {"ttl": 30, "size": 500, "pageSize": 100},
         "initialization": {
             "delay": {"enabled": True, "min": 0, "max": 300},
             "createProjects": {"enabled": True, "number": 1},
             "knownProjects": list(),
         },
         "waitBetweenCycles": {"enabled": True, "min": 1, "max": 10},
+        "stages": list(),
+        "stageUpdateInterval": 5,
+        "openLoop": {"arrivals": "poisson", "lateThreshold": 10, "reportInterval": 10},
+        "plan": {"seed": None, "batchSize": 1024},
+        "replay": {"files": list(), "speed": 1.0, "includeWrites": False},
+        "popularity": {
+            "projects": {
+                "distribution": "uniform",
+                "exponent": 1.0,
+                "hotCount": 10,
+                "hotFactor": 10,
+            },
+            "changes": {
+                "distribution": "uniform",
+                "exponent": 1.0,
+                "hotCount": 10,
+                "hotFactor": 10,
+            },
+        },
+        "seed": {
+            "projects": 100,
+            "projectPrefix": "loadtest-seed",
+            "changesPerProject": 10,
+            "reviewsPerChange": 1,
+            "parallelism": 8,
+            "retries": 3,
+            "checkpoint": "/var/loadtest/seed-checkpoint.json",
+            "reportInterval": 10,
+        },
+        "search": {
+            "initialRate": 1,
+            "stepFactor": 2,
+            "maxRate": 1000,
+            "maxSteps": 20,
+            "tolerance": 5,
+            "warmup": 10,
+            "holdDuration": 60,
+            "sloP99": 1000,
+            "sloErrorRate": 1,
+        },
+    },
+    "accounts": {
+        "pool": list(),
+        "create": {
+            "number": 0,
+            "prefix": "loadtest-user",
+            "password": "secret",
+            "class": "user",
+            "groups": list(),
+        },
+    },
+    "coordinator": {
+        "port": 7000,
+        "workers": 1,
+        "localWorkers": 0,
+        "startDelay": 5,
+        "rateSteps": list(),
+    },
+    "metrics": {
+        "interval": 10,
+        "highestTrackableLatency": 3600,
+        "gitTrace": True,
+        "prometheus": {"enabled": False, "port": 9184},
+        "recorder": {
+            "enabled": False,
+            "directory": "/var/logs/results",
+            "chunkSize": 65536,
+        },
+    },
+    "standin": {
+        "port": 8080,
+        "repositories": "/tmp/loadtest/standin",
+        "latency": {"min": 0, "max": 0},
+        "errorRate": 0,
+    },
+    "benchmark": {
+        "operations": 50,
+        "warmup": 5,
+        "users": 100,
+        "tolerance": 20,
+        "baseline": "/var/loadtest/benchmark-baseline.json",
+    },
+    "generator": {
+        "projects": ["loadtest-history"],
+        "directory": "/tmp/loadtest/generated",
+        "commits": 10000,
+        "files": 1000,
+        "branches": 100,
+        "tags": 100,
+        "changes": 1000,
+        "pushBatchSize": 500,
+    },
+    "content": {
+        "commitsPerPush": {
+            "distribution": "uniform",
+            "min": 1,
+            "max": 5,
+            "median": 2,
+            "sigma": 1.0,
+        },
+        "filesPerCommit": {
+            "distribution": "uniform",
+            "min": 1,
+            "max": 1,
+            "median": 1,
+            "sigma": 1.0,
+        },
+        "fileSize": {
+            "distribution": "uniform",
+            "min": 1,
+            "max": 2000,
+            "median": 1000,
+            "sigma": 1.0,
+        },
+        "directoryDepth": {
+            "distribution": "uniform",
+            "min": 0,
+            "max": 0,
+            "median": 1,
+            "sigma": 1.0,
+        },
+        "binaryRatio": 0.0,
+        "changeTypes": {"add": 1, "modify": 1, "delete": 1, "rename": 0},
+        "hunksPerEdit": {
+            "distribution": "uniform",
+            "min": 1,
+            "max": 3,
+            "median": 1,
+            "sigma": 1.0,
+        },
+        "linesPerHunk": {
+            "distribution": "uniform",
+            "min": 1,
+            "max": 10,
+            "median": 3,
+            "sigma": 1.0,
+        },
     },
     "actions": {
-        "clone_project": {"probability": 1},
-        "create_project": {"probability": 1},
-        "fetch_project": {"probability": 1},
-        "push_for_review": {"probability": 1},
-        "push_head_to_master": {"probability": 1},
-        "query_hundred_open_changes": {"probability": 1},
-        "query_projects": {"probability": 1},
-        "review_change": {"probability": 1},
+        "clone_project": {
+            "probability": 1,
+            "rate": 0,
+            "strategy": "full",
+            "depth": 1,
+            "filter": "blob:none",
+            "objectPool": "/tmp/loadtest/objects",
+            "poolRefreshInterval": 300,
+        },
+        "create_project": {"probability": 1, "rate": 0},
+        "fetch_project": {"probability": 1, "rate": 0},
+        "push_for_review": {"probability": 1, "rate": 0},
+        "push_head_to_master": {"probability": 1, "rate": 0},
+        "query_hundred_open_changes": {"probability": 1, "rate": 0},
+        "query_projects": {"probability": 1, "rate": 0, "pageSize": 500, "pages": 0},
+        "review_change": {"probability": 1, "rate": 0},
     },
 }
 
@@ -46,6 +197,9 @@ ARG_TO_CONFIG_MAPPING = {
     "user": {"category": "gerrit", "option": "user"},
     "password": {"category": "gerrit", "option": "password"},
     "duration": {"category": "testrun", "option": "duration"},
+    "users": {"category": "testrun", "option": "users"},
+    "workers": {"category": "coordinator", "option": "workers"},
+    "local_workers": {"category": "coordinator", "option": "localWorkers"},
 }
 
 
@@ -61,6 +215,7 @@ class Parser:
             self.config = left_outer_join(DEFAULTS, config_from_file)
 
         self._apply_args()
+        self._validate()
 
         return self.config
 
@@ -71,6 +226,21 @@ class Parser:
                     arg
                 ]
 
+    def _validate(self):
+        # Invalid options of the capacity search would only fail at the end of
+        # its first step or keep it from ever finishing.
+        search_config = self.config["testrun"]["search"]
+        for option, minimum in (
+            ("holdDuration", 0),
+            ("stepFactor", 1),
+            ("tolerance", 0),
+        ):
+            if not search_config[option] > minimum:
+                raise ValueError(
+                    "testrun.search.%s must be greater than %s, but is %s"
+                    % (option, minimum, search_config[option])
+                )
+
     def _parse_config_file(self):
         if not os.path.exists(self.args["config_file"]):
             raise FileNotFoundError(
@@ -0,0 +1,30 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .collector import Collector, split_phase
+from .context import ACCOUNT_CLASS, USER_ID
+from .exporter import PrometheusExporter
+from .histogram import LatencyHistogram
+from .recorder import ResultRecorder, read_results
+from .registry import (
+    IN_FLIGHT,
+    add_listener,
+    current_stage,
+    publish,
+    remove_listener,
+    set_stage,
+    start,
+)
+from .report import Report
+from .result import ActionResult
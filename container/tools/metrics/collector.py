@@ -0,0 +1,181 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import logging
+
+from .histogram import LatencyHistogram
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Separates the name of an action from the name of a phase of the action in the
+# keys of the statistics
+PHASE_SEPARATOR = "/"
+
+
+def split_phase(name):
+    action, _, phase = name.partition(PHASE_SEPARATOR)
+    return action, phase or None
+
+
+class ActionStatistics:
+    def __init__(self, highest_trackable_value):
+        self.service_time = LatencyHistogram(highest_trackable_value)
+        self.response_time = LatencyHistogram(highest_trackable_value)
+        self.counters = collections.Counter()
+
+    @property
+    def count(self):
+        return self.service_time.total_count
+
+    def record(self, result):
+        self.service_time.record(result.service_time)
+        self.response_time.record(result.response_time)
+        self.counters.update(result.counters)
+        if result.response_bytes:
+            self.counters["response_bytes"] += result.response_bytes
+
+    def record_phase(self, duration):
+        self.service_time.record(duration)
+        self.response_time.record(duration)
+
+    def reset(self):
+        self.service_time.reset()
+        self.response_time.reset()
+        self.counters.clear()
+
+
+class Collector:
+    def __init__(self, metrics_config, scope_prefix=""):
+        self.log = logging.getLogger("ActionLogger")
+        self.scope_prefix = scope_prefix
+        self.highest_trackable_value = metrics_config["highestTrackableLatency"]
+
+        self.interval_statistics = dict()
+        self.total_statistics = dict()
+        self.stage_statistics = dict()
+        self.account_statistics = dict()
+
+    def record(self, result):
+        key = (result.action, result.status)
+        for statistics in (self.interval_statistics, self.total_statistics):
+            if key not in statistics:
+                statistics[key] = ActionStatistics(self.highest_trackable_value)
+            statistics[key].record(result)
+
+            # Phases of git operations are tracked like separate actions.
+            for phase, duration in result.phases.items():
+                phase_key = (result.action + PHASE_SEPARATOR + phase, result.status)
+                if phase_key not in statistics:
+                    statistics[phase_key] = ActionStatistics(
+                        self.highest_trackable_value
+                    )
+                statistics[phase_key].record_phase(duration)
+
+        for group, group_statistics in (
+            (result.stage, self.stage_statistics),
+            (result.account_class, self.account_statistics),
+        ):
+            if group is None:
+                continue
+            statistics = group_statistics.setdefault(group, dict())
+            if key not in statistics:
+                statistics[key] = ActionStatistics(self.highest_trackable_value)
+            statistics[key].record(result)
+
+    def snapshot(self):
+        # Returns the statistics of the current interval in a serializable form
+        # and starts a new interval.
+        snapshot = [
+            {
+                "action": action,
+                "status": status,
+                "service_time": statistics.service_time.to_dict(),
+                "response_time": statistics.response_time.to_dict(),
+                "counters": dict(statistics.counters),
+            }
+            for (action, status), statistics in self.interval_statistics.items()
+            if statistics.count
+        ]
+        for statistics in self.interval_statistics.values():
+            statistics.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        for entry in snapshot:
+            key = (entry["action"], entry["status"])
+            service_time = LatencyHistogram.from_dict(entry["service_time"])
+            response_time = LatencyHistogram.from_dict(entry["response_time"])
+            for statistics in (self.interval_statistics, self.total_statistics):
+                if key not in statistics:
+                    statistics[key] = ActionStatistics(self.highest_trackable_value)
+                statistics[key].service_time.merge(service_time)
+                statistics[key].response_time.merge(response_time)
+                statistics[key].counters.update(entry.get("counters", dict()))
+
+    async def report_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.report_interval()
+
+    def report_interval(self):
+        self._report(self.scope_prefix + "INTERVAL", self.interval_statistics)
+        for statistics in self.interval_statistics.values():
+            statistics.reset()
+
+    def report_summary(self):
+        self._report(self.scope_prefix + "SUMMARY", self.total_statistics)
+        for stage, statistics in self.stage_statistics.items():
+            self._report("%sSTAGE:%s" % (self.scope_prefix, stage), statistics)
+        for account_class, statistics in sorted(self.account_statistics.items()):
+            self._report(
+                "%sACCOUNT:%s" % (self.scope_prefix, account_class), statistics
+            )
+
+    def _report(self, scope, statistics):
+        for (action, status), action_statistics in sorted(statistics.items()):
+            if not action_statistics.count:
+                continue
+            self.log.info(
+                "Statistics %s %s %s count=%d error_rate=%.2f%% service_ms %s "
+                "response_ms %s%s",
+                scope,
+                action,
+                status,
+                action_statistics.count,
+                self._error_rate(statistics, action) * 100,
+                self._format(action_statistics.service_time),
+                self._format(action_statistics.response_time),
+                "".join(
+                    " %s=%d" % counter
+                    for counter in sorted(action_statistics.counters.items())
+                ),
+            )
+
+    @staticmethod
+    def _error_rate(statistics, action):
+        total = failed = 0
+        for (name, status), action_statistics in statistics.items():
+            if name == action:
+                total += action_statistics.count
+                if status == "FAILED":
+                    failed += action_statistics.count
+        return failed / total if total else 0.0
+
+    @staticmethod
+    def _format(histogram):
+        values = ["p%s=%.2f" % (p, histogram.percentile(p) * 1000) for p in PERCENTILES]
+        values.append("max=%.2f" % (histogram.max() * 1000))
+        return " ".join(values)
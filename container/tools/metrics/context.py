@@ -0,0 +1,21 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextvars
+
+# Id of the simulated user, on whose behalf the current task executes actions.
+USER_ID = contextvars.ContextVar("user_id", default=-1)
+
+# Class of the account of this user, by which results are broken down.
+ACCOUNT_CLASS = contextvars.ContextVar("account_class", default=None)
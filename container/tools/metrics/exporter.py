@@ -0,0 +1,172 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from aiohttp import web
+
+from .collector import split_phase
+from .registry import IN_FLIGHT
+
+# Upper bounds in seconds of the histogram buckets exposed to Prometheus. The
+# buckets are computed from the in-process histograms when the endpoint is
+# scraped, so that the exporter adds no overhead to the execution of actions.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class PrometheusExporter:
+    def __init__(self, collector, port):
+        self.collector = collector
+        self.port = port
+        self.scheduler = None
+        self.runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, port=self.port).start()
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def _handle_metrics(self, _request):
+        return web.Response(
+            body=self.render().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    def render(self):
+        lines = list()
+        statistics = list()
+        phase_statistics = list()
+        for key, action_statistics in sorted(self.collector.total_statistics.items()):
+            if split_phase(key[0])[1]:
+                phase_statistics.append((key, action_statistics))
+            else:
+                statistics.append((key, action_statistics))
+
+        lines.append("# HELP loadtest_actions_total Number of executed actions.")
+        lines.append("# TYPE loadtest_actions_total counter")
+        for (action, status), action_statistics in statistics:
+            lines.append(
+                'loadtest_actions_total{action="%s",status="%s"} %d'
+                % (action, status, action_statistics.count)
+            )
+
+        lines.append("# HELP loadtest_action_failures_total Number of failed actions.")
+        lines.append("# TYPE loadtest_action_failures_total counter")
+        for (action, status), action_statistics in statistics:
+            if status == "FAILED":
+                lines.append(
+                    'loadtest_action_failures_total{action="%s"} %d'
+                    % (action, action_statistics.count)
+                )
+
+        lines.append(
+            "# HELP loadtest_actions_in_flight Number of currently executed actions."
+        )
+        lines.append("# TYPE loadtest_actions_in_flight gauge")
+        for action, count in sorted(IN_FLIGHT.items()):
+            lines.append('loadtest_actions_in_flight{action="%s"} %d' % (action, count))
+
+        for name, attribute in (
+            ("service", "service_time"),
+            ("response", "response_time"),
+        ):
+            rows = list()
+            for (action, status), action_statistics in statistics:
+                labels = 'action="%s",status="%s"' % (action, status)
+                rows.append((labels, getattr(action_statistics, attribute)))
+            lines.extend(
+                self._render_histogram(
+                    "loadtest_action_%s_seconds" % name,
+                    "%s time of actions." % name.capitalize(),
+                    rows,
+                )
+            )
+
+        lines.extend(self._render_phases(statistics, phase_statistics))
+
+        if self.scheduler:
+            lines.extend(self._render_scheduler())
+
+        lines.append("")
+        return "\n".join(lines)
+
+    def _render_phases(self, statistics, phase_statistics):
+        rows = list()
+        for (key, status), action_statistics in phase_statistics:
+            action, phase = split_phase(key)
+            labels = 'action="%s",phase="%s",status="%s"' % (action, phase, status)
+            rows.append((labels, action_statistics.service_time))
+        lines = self._render_histogram(
+            "loadtest_action_phase_seconds",
+            "Time spent in the phases of actions.",
+            rows,
+        )
+
+        lines.append("# HELP loadtest_action_counter_total Counters of actions.")
+        lines.append("# TYPE loadtest_action_counter_total counter")
+        for (action, status), action_statistics in statistics:
+            for counter, value in sorted(action_statistics.counters.items()):
+                lines.append(
+                    'loadtest_action_counter_total{action="%s",counter="%s",status="%s"} %d'
+                    % (action, counter, status, value)
+                )
+        return lines
+
+    @staticmethod
+    def _render_histogram(metric, description, rows):
+        lines = list()
+        lines.append("# HELP %s %s" % (metric, description))
+        lines.append("# TYPE %s histogram" % metric)
+        for labels, histogram in rows:
+            for bound, count in zip(BUCKETS, histogram.cumulative_counts(BUCKETS)):
+                lines.append(
+                    '%s_bucket{%s,le="%s"} %d' % (metric, labels, bound, count)
+                )
+            lines.append(
+                '%s_bucket{%s,le="+Inf"} %d' % (metric, labels, histogram.total_count)
+            )
+            lines.append("%s_sum{%s} %f" % (metric, labels, histogram.sum()))
+            lines.append("%s_count{%s} %d" % (metric, labels, histogram.total_count))
+        return lines
+
+    def _render_scheduler(self):
+        lines = list()
+        for metric, attribute, metric_type, description in (
+            ("dispatched_total", "dispatched", "counter", "Dispatched actions."),
+            ("late_total", "late", "counter", "Actions dispatched late."),
+            ("dropped_total", "dropped", "counter", "Dropped dispatches."),
+            ("skipped_total", "skipped", "counter", "Skipped dispatches."),
+            ("lag_seconds_sum", "lag_total", "counter", "Total scheduling lag."),
+            ("lag_seconds_max", "lag_max", "gauge", "Maximum scheduling lag."),
+        ):
+            name = "loadtest_scheduler_%s" % metric
+            lines.append("# HELP %s %s" % (name, description))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            for action, stats in sorted(self.scheduler.stats.items()):
+                lines.append(
+                    '%s{action="%s"} %s' % (name, action, getattr(stats, attribute))
+                )
+
+        lines.append("# HELP loadtest_scheduler_rate Target rate of actions.")
+        lines.append("# TYPE loadtest_scheduler_rate gauge")
+        for action, rate in sorted(self.scheduler.rates.items()):
+            lines.append(
+                'loadtest_scheduler_rate{action="%s"} %s'
+                % (action, rate * self.scheduler.rate_scale)
+            )
+        return lines
@@ -0,0 +1,115 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+# Latencies are recorded in microseconds. Values below SUB_BUCKET_COUNT are
+# recorded exactly. Above, each power of 2 is split into SUB_BUCKET_COUNT / 2
+# linear sub-buckets, which limits the relative error to less than 1% while the
+# memory used by a histogram only depends on the highest trackable value.
+SUB_BUCKET_COUNT = 256
+SUB_BUCKET_BITS = SUB_BUCKET_COUNT.bit_length() - 1
+SUB_BUCKET_HALF_COUNT = SUB_BUCKET_COUNT // 2
+
+
+class LatencyHistogram:
+    def __init__(self, highest_trackable_value=3600):
+        self.highest_trackable_value = int(highest_trackable_value * 1e6)
+        self.counts = np.zeros(
+            self._index_of(self.highest_trackable_value) + 1, dtype=np.int64
+        )
+        self.total_count = 0
+        self.total_value = 0
+        self.max_value = 0
+
+    def record(self, value):
+        value = min(max(int(value * 1e6), 0), self.highest_trackable_value)
+        self.counts[self._index_of(value)] += 1
+        self.total_count += 1
+        self.total_value += value
+        self.max_value = max(self.max_value, value)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total_count += other.total_count
+        self.total_value += other.total_value
+        self.max_value = max(self.max_value, other.max_value)
+
+    def to_dict(self):
+        indices = np.nonzero(self.counts)[0]
+        return {
+            "highest": self.highest_trackable_value / 1e6,
+            "indices": indices.tolist(),
+            "counts": self.counts[indices].tolist(),
+            "total_value": self.total_value,
+            "max_value": self.max_value,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["highest"])
+        histogram.counts[data["indices"]] = data["counts"]
+        histogram.total_count = sum(data["counts"])
+        histogram.total_value = data["total_value"]
+        histogram.max_value = data["max_value"]
+        return histogram
+
+    def reset(self):
+        self.counts[:] = 0
+        self.total_count = 0
+        self.total_value = 0
+        self.max_value = 0
+
+    def percentile(self, percentile):
+        if not self.total_count:
+            return 0.0
+        rank = max(1, int(np.ceil(percentile / 100 * self.total_count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._highest_value_at(index), self.max_value) / 1e6
+
+    def percentiles(self, percentiles):
+        return {p: self.percentile(p) for p in percentiles}
+
+    def cumulative_counts(self, values):
+        cumulative_counts = np.cumsum(self.counts)
+        indices = [
+            self._index_of(min(int(value * 1e6), self.highest_trackable_value))
+            for value in values
+        ]
+        return cumulative_counts[indices].tolist()
+
+    def max(self):
+        return self.max_value / 1e6
+
+    def sum(self):
+        return self.total_value / 1e6
+
+    @staticmethod
+    def _index_of(value):
+        if value < SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return (
+            SUB_BUCKET_COUNT
+            + (shift - 1) * SUB_BUCKET_HALF_COUNT
+            + (value >> shift)
+            - SUB_BUCKET_HALF_COUNT
+        )
+
+    @staticmethod
+    def _highest_value_at(index):
+        if index < SUB_BUCKET_COUNT:
+            return index
+        shift, sub_bucket = divmod(index - SUB_BUCKET_COUNT, SUB_BUCKET_HALF_COUNT)
+        return ((sub_bucket + SUB_BUCKET_HALF_COUNT + 1) << (shift + 1)) - 1
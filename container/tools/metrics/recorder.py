@@ -0,0 +1,153 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"GLTRES01"
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sI")
+
+COLUMNS = (
+    ("timestamp", "<f8"),
+    ("action", "<u2"),
+    ("failed", "u1"),
+    ("service_time", "<f4"),
+    ("response_time", "<f4"),
+    ("bytes", "<i8"),
+    ("ttfb", "<f4"),
+    ("user", "<i4"),
+    ("stage", "<u2"),
+    ("account", "<u2"),
+)
+
+
+class ResultRecorder:
+    # Results are stored column-wise in fixed-size arrays. Full buffers are
+    # compressed and appended to the results file as a chunk, which contains a
+    # JSON header describing the columns and the ids of the actions followed by
+    # one compressed block per column.
+    def __init__(self, path, chunk_size=65536):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = {
+            name: np.empty(self.chunk_size, dtype=dtype) for name, dtype in COLUMNS
+        }
+        self.size = 0
+        self.action_ids = dict()
+        self.stage_ids = {None: 0}
+        self.account_ids = {None: 0}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, "wb")
+        self.file.write(MAGIC)
+
+    def record(self, result):
+        if result.action not in self.action_ids:
+            self.action_ids[result.action] = len(self.action_ids)
+        if result.stage not in self.stage_ids:
+            self.stage_ids[result.stage] = len(self.stage_ids)
+        if result.account_class not in self.account_ids:
+            self.account_ids[result.account_class] = len(self.account_ids)
+
+        i = self.size
+        self.columns["timestamp"][i] = result.timestamp
+        self.columns["action"][i] = self.action_ids[result.action]
+        self.columns["failed"][i] = result.failed
+        self.columns["service_time"][i] = result.service_time
+        self.columns["response_time"][i] = result.response_time
+        self.columns["bytes"][i] = result.response_bytes
+        self.columns["ttfb"][i] = result.phases.get("ttfb", np.nan)
+        self.columns["user"][i] = result.user
+        self.columns["stage"][i] = self.stage_ids[result.stage]
+        self.columns["account"][i] = self.account_ids[result.account_class]
+        self.size += 1
+
+        if self.size == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.size:
+            return
+
+        blocks = [
+            zlib.compress(self.columns[name][: self.size].tobytes(), 1)
+            for name, _ in COLUMNS
+        ]
+        header = json.dumps(
+            {
+                "rows": self.size,
+                "actions": sorted(self.action_ids, key=self.action_ids.get),
+                "stages": sorted(self.stage_ids, key=self.stage_ids.get),
+                "accounts": sorted(self.account_ids, key=self.account_ids.get),
+                "columns": [
+                    [name, dtype, len(block)]
+                    for (name, dtype), block in zip(COLUMNS, blocks)
+                ],
+            }
+        ).encode("utf-8")
+
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(header)))
+        self.file.write(header)
+        for block in blocks:
+            self.file.write(block)
+        self.file.flush()
+        self.size = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_results(path):
+    columns = dict()
+    names = {"action": list(), "stage": [None], "account": [None]}
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[: len(MAGIC)] != MAGIC:
+                raise ValueError("Not a results file: %s" % path)
+
+            view = memoryview(data)
+            offset = len(MAGIC)
+            # A chunk may be incomplete, if the load test was killed while writing.
+            while offset + CHUNK_HEADER.size <= len(data):
+                magic, header_length = CHUNK_HEADER.unpack_from(data, offset)
+                offset += CHUNK_HEADER.size
+                if magic != CHUNK_MAGIC:
+                    raise ValueError("Corrupt results file: %s" % path)
+                header = json.loads(bytes(view[offset : offset + header_length]))
+                offset += header_length
+
+                chunk_length = sum(length for _, _, length in header["columns"])
+                if offset + chunk_length > len(data):
+                    break
+                for name, dtype, length in header["columns"]:
+                    columns.setdefault(name, list()).append(
+                        np.frombuffer(
+                            zlib.decompress(view[offset : offset + length]),
+                            dtype=dtype,
+                        )
+                    )
+                    offset += length
+                names["action"] = header["actions"]
+                names["stage"] = header.get("stages", names["stage"])
+                names["account"] = header.get("accounts", names["account"])
+            view.release()
+
+    return (names, {name: np.concatenate(parts) for name, parts in columns.items()})
@@ -0,0 +1,51 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+
+# Listeners receiving the results of all actions executed in this process.
+_LISTENERS = list()
+
+# Number of actions per action type that are currently being executed.
+IN_FLIGHT = collections.Counter()
+
+# Name of the currently active stage of the load profile.
+_STAGE = None
+
+
+def add_listener(listener):
+    _LISTENERS.append(listener)
+
+
+def remove_listener(listener):
+    _LISTENERS.remove(listener)
+
+
+def set_stage(stage):
+    global _STAGE  # pylint: disable=W0603
+    _STAGE = stage
+
+
+def current_stage():
+    return _STAGE
+
+
+def start(action):
+    IN_FLIGHT[action] += 1
+
+
+def publish(result):
+    IN_FLIGHT[result.action] -= 1
+    for listener in _LISTENERS:
+        listener.record(result)
@@ -0,0 +1,197 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+import numpy as np
+
+from .recorder import read_results
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Report:
+    def __init__(self, paths, interval=60):
+        self.paths = paths
+        self.interval = interval
+
+    def generate(self):
+        names, columns = self._load()
+        if not columns["timestamp"].size:
+            return ["No results found."]
+
+        start = columns["timestamp"].min()
+        duration = max(columns["timestamp"].max() - start, 1e-9)
+        lines = [
+            "Results from %s, duration %.1fs, %d actions"
+            % (
+                datetime.datetime.utcfromtimestamp(start).isoformat(),
+                duration,
+                columns["timestamp"].size,
+            ),
+            "",
+        ]
+
+        for action_id, action in enumerate(names["action"]):
+            selection = columns["action"] == action_id
+            if not selection.any():
+                continue
+            lines.extend(
+                self._summarize(
+                    action,
+                    {name: column[selection] for name, column in columns.items()},
+                    start,
+                    duration,
+                )
+            )
+            for column, label in (("stage", "stage"), ("account", "account class")):
+                lines.extend(
+                    self._summarize_groups(
+                        label,
+                        names[column],
+                        columns[column][selection],
+                        columns["response_time"][selection],
+                    )
+                )
+            lines.append("")
+        return lines
+
+    def _load(self):
+        # Ids of actions, stages and account classes are only unique within a
+        # single file and are thus mapped to ids common to all files.
+        names = {"action": list(), "stage": [None], "account": [None]}
+        parts = dict()
+        for path in self.paths:
+            file_names, columns = read_results(path)
+            if not columns:
+                continue
+            for column in ("stage", "account"):
+                columns.setdefault(
+                    column, np.zeros(columns["timestamp"].size, dtype=np.uint16)
+                )
+            columns.setdefault(
+                "ttfb", np.full(columns["timestamp"].size, np.nan, dtype=np.float32)
+            )
+            for column, file_column_names in file_names.items():
+                for name in file_column_names:
+                    if name not in names[column]:
+                        names[column].append(name)
+                mapping = np.array(
+                    [names[column].index(name) for name in file_column_names],
+                    dtype=np.uint16,
+                )
+                columns[column] = mapping[columns[column]]
+            for name, column in columns.items():
+                parts.setdefault(name, list()).append(column)
+
+        if not parts:
+            return names, {"timestamp": np.empty(0)}
+        return names, {name: np.concatenate(part) for name, part in parts.items()}
+
+    def _summarize(self, action, columns, start, duration):
+        count = columns["timestamp"].size
+        errors = int(np.count_nonzero(columns["failed"]))
+        lines = [
+            "%s: count=%d errors=%d (%.2f%%) throughput=%.2f/s bytes=%d"
+            % (
+                action,
+                count,
+                errors,
+                errors / count * 100,
+                count / duration,
+                int(columns["bytes"].sum()),
+            )
+        ]
+        for name, label in (
+            ("service_time", "service"),
+            ("response_time", "response"),
+            ("ttfb", "ttfb"),
+        ):
+            # The time to first byte is only known for REST actions.
+            latencies = columns[name][~np.isnan(columns[name])]
+            if not latencies.size:
+                continue
+            values = np.percentile(latencies, PERCENTILES) * 1000
+            lines.append(
+                "  %s_ms %s max=%.2f"
+                % (
+                    label,
+                    " ".join("p%s=%.2f" % (p, v) for p, v in zip(PERCENTILES, values)),
+                    latencies.max() * 1000,
+                )
+            )
+        lines.extend(
+            self._format_time_series(
+                columns["timestamp"] - start, columns["response_time"]
+            )
+        )
+        return lines
+
+    @staticmethod
+    def _summarize_groups(label, groups, group_ids, latencies):
+        # Results of actions, which are not part of a group, e.g. of a stage,
+        # have the group None.
+        lines = list()
+        for group_id, group in enumerate(groups):
+            if group is None:
+                continue
+            group_latencies = latencies[group_ids == group_id]
+            if not group_latencies.size:
+                continue
+            values = np.percentile(group_latencies, PERCENTILES) * 1000
+            lines.append(
+                "  %s %s: count=%d response_ms %s"
+                % (
+                    label,
+                    group,
+                    group_latencies.size,
+                    " ".join("p%s=%.2f" % (p, v) for p, v in zip(PERCENTILES, values)),
+                )
+            )
+        return lines
+
+    def _format_time_series(self, offsets, latencies):
+        lines = ["  %8s %10s %10s %10s" % ("t[s]", "ops/s", "p50_ms", "p99_ms")]
+        buckets, counts, p50, p99 = self._time_series(offsets, latencies)
+        for bucket, bucket_count, bucket_p50, bucket_p99 in zip(
+            buckets, counts, p50, p99
+        ):
+            lines.append(
+                "  %8d %10.2f %10.2f %10.2f"
+                % (
+                    bucket * self.interval,
+                    bucket_count / self.interval,
+                    bucket_p50 * 1000,
+                    bucket_p99 * 1000,
+                )
+            )
+        return lines
+
+    def _time_series(self, offsets, latencies):
+        # Percentiles of all time buckets are computed at once by sorting the
+        # latencies by bucket and latency and indexing into the sorted array.
+        bucket_ids = (offsets // self.interval).astype(np.int64)
+        counts = np.bincount(bucket_ids)
+        order = np.lexsort((latencies, bucket_ids))
+        sorted_latencies = latencies[order]
+        bucket_starts = np.cumsum(counts) - counts
+
+        buckets = np.nonzero(counts)[0]
+        counts = counts[buckets]
+        bucket_starts = bucket_starts[buckets]
+        percentiles = list()
+        for percentile in (50, 99):
+            ranks = np.ceil(percentile / 100 * counts).astype(np.int64) - 1
+            percentiles.append(sorted_latencies[bucket_starts + ranks])
+        return buckets, counts, percentiles[0], percentiles[1]
@@ -0,0 +1,59 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class ActionResult:
+    __slots__ = (
+        "action",
+        "failed",
+        "service_time",
+        "response_time",
+        "timestamp",
+        "response_bytes",
+        "user",
+        "stage",
+        "account_class",
+        "phases",
+        "counters",
+    )
+
+    def __init__(
+        self,
+        action,
+        failed,
+        service_time,
+        response_time,
+        timestamp,
+        response_bytes=0,
+        user=-1,
+        stage=None,
+        account_class=None,
+        phases=None,
+        counters=None,
+    ):
+        self.action = action
+        self.failed = failed
+        self.service_time = service_time
+        self.response_time = response_time
+        self.timestamp = timestamp
+        self.response_bytes = response_bytes
+        self.user = user
+        self.stage = stage
+        self.account_class = account_class
+        self.phases = phases or dict()
+        self.counters = counters or dict()
+
+    @property
+    def status(self):
+        return "FAILED" if self.failed else "OK"
@@ -0,0 +1,353 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import copy
+import gc
+import json
+import logging
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+import actions
+import metrics
+
+from .instance import LoadTestInstance
+from .planner import CYCLE, resolve_seed
+
+START_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "start_test.py")
+STARTUP_TIMEOUT = 30
+
+
+class FailureCounter:
+    def __init__(self):
+        self.failed = 0
+
+    def record(self, result):
+        if result.failed:
+            self.failed += 1
+
+
+class ActionBenchmark:
+    def __init__(self, action, operations):
+        self.action = action
+        self.operations = operations
+        self.failed = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.child_cpu_time = 0.0
+        self.allocated = 0
+        self.retained_blocks = 0
+
+    @property
+    def cpu_per_op(self):
+        # CPU time of the load tester and the git processes it started
+        return (self.cpu_time + self.child_cpu_time) / self.operations
+
+    @property
+    def ops_per_core(self):
+        return 1 / self.cpu_per_op if self.cpu_per_op else 0.0
+
+    @property
+    def allocated_per_op(self):
+        return self.allocated / self.operations
+
+    def to_dict(self):
+        return {
+            "cpuPerOp": self.cpu_per_op,
+            "allocatedPerOp": self.allocated_per_op,
+            "retainedBlocksPerOp": self.retained_blocks / self.operations,
+        }
+
+
+class ClientBenchmark:
+    # Measures the client-side cost of each action type, i.e. the overhead of
+    # the load tester itself. The actions are executed one after another by a
+    # single simulated user against a stand-in server without latency, which
+    # runs in a separate process, so that its CPU time is not accounted to the
+    # actions. CPU time is measured in a first pass and allocations in a second
+    # pass, since tracing allocations slows down the actions.
+    def __init__(self, test_config, save_baseline=False):
+        self.log = logging.getLogger("ActionLogger")
+        self.config = copy.deepcopy(test_config)
+        self.save_baseline = save_baseline
+
+        benchmark_config = self.config["benchmark"]
+        self.operations = benchmark_config["operations"]
+        self.warmup = benchmark_config["warmup"]
+        self.num_users = benchmark_config["users"]
+        self.tolerance = benchmark_config["tolerance"] / 100
+        actions.trace2.set_enabled(self.config["metrics"]["gitTrace"])
+        self.baseline_path = benchmark_config["baseline"]
+
+        self.results = list()
+        self.memory_per_user = 0.0
+
+    def run(self):
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
+        loop = asyncio.get_event_loop()
+        loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=self.config["testrun"]["gitWorkers"])
+        )
+        with tempfile.TemporaryDirectory(prefix="loadtest-benchmark-") as tmp:
+            server = await self._start_server(tmp)
+            try:
+                await self._measure_actions(os.path.join(tmp, "workdir"))
+                await self._measure_users()
+            finally:
+                server.terminate()
+                server.wait()
+
+        current = self._to_dict()
+        baseline = self._read_baseline()
+        regressions = self._compare(current, baseline)
+        self._report(current, baseline)
+        if self.save_baseline:
+            os.makedirs(os.path.dirname(self.baseline_path) or ".", exist_ok=True)
+            with open(self.baseline_path, "w") as f:
+                json.dump(current, f, indent=2, sort_keys=True)
+            self.log.info("Benchmark baseline written to %s", self.baseline_path)
+        for regression in regressions:
+            self.log.info("Benchmark regression: %s", regression)
+        return not regressions
+
+    async def _start_server(self, tmp):
+        with socket.socket() as s:
+            s.bind(("localhost", 0))
+            port = s.getsockname()[1]
+        config_path = os.path.join(tmp, "standin.yaml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump(
+                {
+                    "standin": {
+                        "port": port,
+                        "repositories": os.path.join(tmp, "repositories"),
+                        "latency": {"min": 0, "max": 0},
+                        "errorRate": 0,
+                    }
+                },
+                f,
+            )
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                START_SCRIPT,
+                "standin",
+                "--config",
+                config_path,
+                "--log-file",
+                os.path.join(tmp, "standin.log"),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("localhost", port)
+                writer.close()
+                break
+            except OSError as e:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    server.kill()
+                    raise RuntimeError("Stand-in server could not be started") from e
+                await asyncio.sleep(0.1)
+
+        self.config["gerrit"]["url"] = "http://localhost:%d" % port
+        self.log.info("Benchmarking against stand-in server on port %d", port)
+        return server
+
+    async def _measure_actions(self, workdir):
+        resolve_seed(self.config)
+        user = LoadTestInstance(self.config)
+        user.workdir = workdir
+        user.session = actions.create_session(self.config["http"])
+        counter = FailureCounter()
+        try:
+            for action in CYCLE:
+                for _ in range(self.warmup):
+                    await user.execute(action)
+
+                result = ActionBenchmark(action, self.operations)
+                metrics.add_listener(counter)
+                counter.failed = 0
+                gc.collect()
+                blocks = sys.getallocatedblocks()
+                child_cpu_time = _child_cpu_time()
+                cpu_time = time.process_time()
+                start = time.monotonic()
+                for _ in range(self.operations):
+                    await user.execute(action)
+                result.wall_time = time.monotonic() - start
+                result.cpu_time = time.process_time() - cpu_time
+                result.child_cpu_time = _child_cpu_time() - child_cpu_time
+                gc.collect()
+                result.retained_blocks = sys.getallocatedblocks() - blocks
+                metrics.remove_listener(counter)
+                result.failed = counter.failed
+
+                for _ in range(self.operations):
+                    tracemalloc.start()
+                    await user.execute(action)
+                    result.allocated += tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                self.results.append(result)
+                self.log.info(
+                    "Benchmarked %s: %.2f ms CPU per operation",
+                    action,
+                    result.cpu_per_op * 1000,
+                )
+        finally:
+            await user.stop()
+
+    async def _measure_users(self):
+        # Memory of idle simulated users, including their HTTP session and the
+        # first batch of their workload plan. Like in a test run, workspaces,
+        # the change catalog and the accounts are shared by all users and are
+        # thus not part of the memory per user.
+        workspaces = actions.WorkspaceManager(self.config["testrun"]["workspace"])
+        change_catalog = actions.ChangeCatalog(self.config)
+        accounts = actions.AccountPool(self.config)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        users = list()
+        for user_id in range(self.num_users):
+            user = LoadTestInstance(
+                self.config, user_id, workspaces, change_catalog, accounts
+            )
+            user.session = actions.create_session(self.config["http"])
+            cycles = user.plan.cycles()
+            next(cycles)
+            users.append((user, cycles))
+        self.memory_per_user = (
+            tracemalloc.get_traced_memory()[0] - before
+        ) / self.num_users
+        tracemalloc.stop()
+        for user, _ in users:
+            await user.stop()
+
+    def _to_dict(self):
+        return {
+            "actions": {result.action: result.to_dict() for result in self.results},
+            "memoryPerUser": self.memory_per_user,
+        }
+
+    def _read_baseline(self):
+        if not os.path.exists(self.baseline_path):
+            self.log.info(
+                "No benchmark baseline found at %s, create one with --save-baseline",
+                self.baseline_path,
+            )
+            return None
+        with open(self.baseline_path, "r") as f:
+            return json.load(f)
+
+    def _compare(self, current, baseline):
+        # Values exceeding the baseline by more than the tolerance are reported
+        # as regressions. Failed actions are always regressions, since their
+        # cost is not comparable.
+        regressions = [
+            "%s failed %d times" % (result.action, result.failed)
+            for result in self.results
+            if result.failed
+        ]
+        if not baseline:
+            return regressions
+        values = [
+            ("memoryPerUser", current["memoryPerUser"], baseline["memoryPerUser"])
+        ]
+        for action, result in current["actions"].items():
+            for key in ("cpuPerOp", "allocatedPerOp"):
+                if action in baseline["actions"]:
+                    values.append(
+                        (
+                            "%s.%s" % (action, key),
+                            result[key],
+                            baseline["actions"][action][key],
+                        )
+                    )
+        for name, value, baseline_value in values:
+            if value > baseline_value * (1 + self.tolerance):
+                regressions.append(
+                    "%s is %.1f%% above baseline (%.6g > %.6g)"
+                    % (name, _change(value, baseline_value), value, baseline_value)
+                )
+        return regressions
+
+    def _report(self, current, baseline):
+        self.log.info("Benchmark results:")
+        self.log.info(
+            "%-27s %6s %7s %10s %10s %10s %10s %12s %10s",
+            "action",
+            "ops",
+            "failed",
+            "cpu_ms/op",
+            "git_ms/op",
+            "ops/s/core",
+            "cpu_diff_%",
+            "alloc_KiB/op",
+            "blocks/op",
+        )
+        for result in self.results:
+            cpu_change = float("nan")
+            if baseline and result.action in baseline["actions"]:
+                cpu_change = _change(
+                    result.cpu_per_op, baseline["actions"][result.action]["cpuPerOp"]
+                )
+            self.log.info(
+                "%-27s %6d %7d %10.2f %10.2f %10.1f %10.1f %12.1f %10.1f",
+                result.action,
+                result.operations,
+                result.failed,
+                result.cpu_per_op * 1000,
+                result.child_cpu_time / result.operations * 1000,
+                result.ops_per_core,
+                cpu_change,
+                result.allocated_per_op / 1024,
+                result.retained_blocks / result.operations,
+            )
+        self.log.info(
+            "Memory per simulated user: %.1f KiB%s",
+            current["memoryPerUser"] / 1024,
+            (
+                " (%+.1f%% against baseline)"
+                % _change(current["memoryPerUser"], baseline["memoryPerUser"])
+                if baseline
+                else ""
+            ),
+        )
+
+
+def _child_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _change(value, baseline_value):
+    return (value / baseline_value - 1) * 100 if baseline_value else float("nan")
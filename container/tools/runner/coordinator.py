@@ -0,0 +1,247 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import socket
+import sys
+import time
+
+import metrics
+
+from .engine import LoadTestEngine
+from .planner import resolve_seed
+
+# Maximum size of a single message. Messages containing histograms may exceed
+# the default limit of asyncio streams.
+MESSAGE_LIMIT = 2**24
+
+
+async def send_message(writer, message):
+    writer.write(json.dumps(message).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+async def read_message(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class Coordinator:
+    def __init__(self, test_config, log_file=None):
+        self.config = test_config
+        self.log = logging.getLogger("ActionLogger")
+        self.log_file = log_file
+
+        self.coordinator_config = self.config["coordinator"]
+        self.num_workers = self.coordinator_config["workers"]
+        self.collector = metrics.Collector(self.config["metrics"], "CLUSTER_")
+        self.log.info("Workload plan seed: %d", resolve_seed(self.config))
+
+        self.workers = list()
+        self.num_finished = 0
+        self.all_registered = None
+        self.all_finished = None
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        self.all_registered = asyncio.Event()
+        self.all_finished = asyncio.Event()
+        server = await asyncio.start_server(
+            self._handle_worker,
+            port=self.coordinator_config["port"],
+            limit=MESSAGE_LIMIT,
+        )
+        processes = await self._spawn_local_workers()
+        self.log.info("Waiting for %d workers to connect.", self.num_workers)
+
+        tasks = list()
+        try:
+            await self.all_registered.wait()
+            start = time.time() + self.coordinator_config["startDelay"]
+            await self._broadcast({"type": "start", "at": start})
+            self.log.info("Starting %d workers.", self.num_workers)
+
+            tasks.append(
+                asyncio.ensure_future(
+                    self.collector.report_periodically(
+                        self.config["metrics"]["interval"]
+                    )
+                )
+            )
+            tasks.append(asyncio.ensure_future(self._apply_rate_steps(start)))
+            await self.all_finished.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            server.close()
+            await server.wait_closed()
+            for process in processes:
+                await process.wait()
+            self.collector.report_summary()
+
+    async def set_rates(self, rates=None, scale=None):
+        await self._broadcast({"type": "rates", "rates": rates, "scale": scale})
+
+    async def _spawn_local_workers(self):
+        processes = list()
+        for i in range(self.coordinator_config["localWorkers"]):
+            processes.append(
+                await asyncio.create_subprocess_exec(
+                    sys.executable,
+                    sys.argv[0],
+                    "worker",
+                    "--coordinator",
+                    "localhost:%d" % self.coordinator_config["port"],
+                    "--log-file",
+                    self._worker_log_file(i),
+                )
+            )
+        return processes
+
+    def _worker_log_file(self, worker_index):
+        # Local workers log next to the coordinator, e.g. to loadtester-worker-0.log
+        # for loadtester.log. Without a log file of the coordinator, they only log
+        # to the standard error, which they inherit from the coordinator.
+        if not self.log_file:
+            return os.devnull
+        root, extension = os.path.splitext(self.log_file)
+        return "%s-worker-%d%s" % (root, worker_index, extension)
+
+    async def _apply_rate_steps(self, start):
+        for step in sorted(
+            self.coordinator_config["rateSteps"], key=lambda s: s["after"]
+        ):
+            await asyncio.sleep(max(0, start + step["after"] - time.time()))
+            self.log.info("Scaling target rates by %.2f.", step["scale"])
+            await self.set_rates(scale=step["scale"])
+
+    async def _broadcast(self, message):
+        for writer in self.workers:
+            await send_message(writer, message)
+
+    def _create_worker_config(self, worker_id):
+        # Target rates are configured for the whole cluster and are thus split
+        # evenly between the workers.
+        worker_config = copy.deepcopy(self.config)
+        for action in worker_config["actions"].values():
+            action["rate"] = action["rate"] / self.num_workers
+        worker_config["metrics"]["prometheus"]["port"] += worker_id
+        return worker_config
+
+    async def _handle_worker(self, reader, writer):
+        hello = await read_message(reader)
+        if not hello or len(self.workers) >= self.num_workers:
+            writer.close()
+            return
+
+        worker_id = len(self.workers)
+        self.workers.append(writer)
+        self.log.info("Worker %d connected from %s.", worker_id, hello["host"])
+        await send_message(
+            writer,
+            {
+                "type": "config",
+                "workerId": worker_id,
+                "config": self._create_worker_config(worker_id),
+            },
+        )
+        if len(self.workers) == self.num_workers:
+            self.all_registered.set()
+
+        while True:
+            message = await read_message(reader)
+            if message is None or message["type"] == "done":
+                break
+            if message["type"] == "statistics":
+                self.collector.merge(message["statistics"])
+
+        self.log.info("Worker %d finished.", worker_id)
+        self.num_finished += 1
+        if self.num_finished == self.num_workers:
+            self.all_finished.set()
+
+
+class Worker:
+    def __init__(self, coordinator_address):
+        self.log = logging.getLogger("ActionLogger")
+        host, port = coordinator_address.rsplit(":", 1)
+        self.host = host
+        self.port = int(port)
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, limit=MESSAGE_LIMIT
+        )
+        await send_message(writer, {"type": "hello", "host": socket.gethostname()})
+
+        message = await read_message(reader)
+        test_config = message["config"]
+        engine = LoadTestEngine(
+            test_config,
+            user_id_offset=message["workerId"] * test_config["testrun"]["users"],
+        )
+
+        # Results are collected separately for the coordinator, since the
+        # interval statistics of the engine are reset by its own reporting.
+        shipper = metrics.Collector(test_config["metrics"])
+        metrics.add_listener(shipper)
+
+        message = await read_message(reader)
+        await asyncio.sleep(max(0, message["at"] - time.time()))
+
+        control = asyncio.ensure_future(self._receive_control(reader, engine))
+        shipping = asyncio.ensure_future(
+            self._ship_periodically(writer, shipper, test_config["metrics"]["interval"])
+        )
+        try:
+            await engine.run_async()
+        finally:
+            control.cancel()
+            shipping.cancel()
+            metrics.remove_listener(shipper)
+            await send_message(
+                writer, {"type": "statistics", "statistics": shipper.snapshot()}
+            )
+            await send_message(writer, {"type": "done"})
+            writer.close()
+
+    async def _receive_control(self, reader, engine):
+        while True:
+            message = await read_message(reader)
+            if message is None:
+                return
+            if message["type"] == "rates":
+                if engine.scheduler:
+                    engine.scheduler.set_rates(message["rates"], message["scale"])
+                else:
+                    self.log.info("Ignoring rate change in closed-loop mode.")
+
+    @staticmethod
+    async def _ship_periodically(writer, shipper, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await send_message(
+                writer, {"type": "statistics", "statistics": shipper.snapshot()}
+            )
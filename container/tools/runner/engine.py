@@ -0,0 +1,218 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+import socket
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+
+import actions
+import metrics
+
+from .instance import LoadTestInstance
+from .planner import resolve_seed
+from .replay import LogReplayer
+from .scheduler import OpenLoopScheduler
+from .search import CapacitySearch
+from .seeder import Seeder
+from .stages import StageController
+
+
+# pylint: disable=W0703
+class LoadTestEngine:
+    def __init__(self, test_config, user_id_offset=0):
+        self.config = test_config
+        self.user_id_offset = user_id_offset
+        self.log = logging.getLogger("ActionLogger")
+
+        self.mode = self.config["testrun"]["mode"]
+        self.num_users = self.config["testrun"]["users"]
+        self.git_workers = self.config["testrun"]["gitWorkers"]
+        self.metrics_config = self.config["metrics"]
+        self.collector = metrics.Collector(self.metrics_config)
+        actions.trace2.set_enabled(self.metrics_config["gitTrace"])
+        self.stages = self.config["testrun"]["stages"]
+        self.exporter = None
+        self.scheduler = None
+        self.workspaces = actions.WorkspaceManager(self.config["testrun"]["workspace"])
+        self.change_catalog = actions.ChangeCatalog(self.config)
+        self.accounts = actions.AccountPool(self.config)
+
+        self.users = list()
+        self.user_tasks = list()
+        self.active_users = 0
+
+        self.log.info("Workload plan seed: %d", resolve_seed(self.config))
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        loop = asyncio.get_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.git_workers))
+
+        metrics.add_listener(self.collector)
+        reporter = asyncio.ensure_future(
+            self.collector.report_periodically(self.metrics_config["interval"])
+        )
+        recorder = None
+        if self.metrics_config["recorder"]["enabled"]:
+            recorder = metrics.ResultRecorder(
+                os.path.join(
+                    self.metrics_config["recorder"]["directory"],
+                    "results-%s-%d.bin" % (socket.gethostname(), os.getpid()),
+                ),
+                self.metrics_config["recorder"]["chunkSize"],
+            )
+            metrics.add_listener(recorder)
+        if self.metrics_config["prometheus"]["enabled"]:
+            self.exporter = metrics.PrometheusExporter(
+                self.collector, self.metrics_config["prometheus"]["port"]
+            )
+            await self.exporter.start()
+
+        try:
+            if self.mode == "closed":
+                await self._run_closed_loop()
+            elif self.mode == "seed":
+                await Seeder(self.config, self.workspaces, self.change_catalog).run()
+            else:
+                await self._run_open_loop()
+        finally:
+            reporter.cancel()
+            self.collector.report_summary()
+            metrics.remove_listener(self.collector)
+            if recorder:
+                metrics.remove_listener(recorder)
+                recorder.close()
+            if self.exporter:
+                await self.exporter.stop()
+
+    def set_users(self, num_users):
+        if num_users == self.active_users:
+            return
+        self.log.info("Changing number of simulated users to %d.", num_users)
+        if self.mode == "closed":
+            self._set_closed_loop_users(num_users)
+        else:
+            self._set_open_loop_users(num_users)
+        self.active_users = num_users
+
+    def set_rate_scale(self, scale):
+        if self.scheduler:
+            self.scheduler.rate_scale = scale
+
+    def _create_user(self):
+        user = LoadTestInstance(
+            self.config,
+            self.user_id_offset + len(self.users),
+            self.workspaces,
+            self.change_catalog,
+            self.accounts,
+        )
+        self.users.append(user)
+        return user
+
+    def _create_stage_controller(self):
+        return StageController(
+            self.stages,
+            self.num_users,
+            self.config["testrun"]["stageUpdateInterval"],
+            self.set_users,
+            self.set_rate_scale,
+        )
+
+    async def _run_closed_loop(self):
+        if self.stages:
+            await self._create_stage_controller().run()
+            self._set_closed_loop_users(0)
+        else:
+            self.set_users(self.num_users)
+        await asyncio.gather(*self.user_tasks)
+
+    def _set_closed_loop_users(self, num_users):
+        # Removed users finish their current cycle before they stop.
+        running = [user for user in self.users if user.active]
+        for user in running[num_users:]:
+            user.active = False
+        for _ in range(num_users - len(running)):
+            user = self._create_user()
+            self.user_tasks.append(asyncio.ensure_future(self._run_user(user)))
+
+    async def _run_open_loop(self):
+        scheduler_class = LogReplayer if self.mode == "replay" else OpenLoopScheduler
+        self.scheduler = scheduler_class(self.config, list(), self.user_id_offset)
+        if self.exporter:
+            self.exporter.scheduler = self.scheduler
+        try:
+            if self.mode == "search":
+                await self._run_search()
+            elif self.stages:
+                controller = self._create_stage_controller()
+                scheduler = asyncio.ensure_future(
+                    self.scheduler.run(controller.duration)
+                )
+                await controller.run()
+                await scheduler
+            else:
+                self.set_users(self.num_users)
+                await asyncio.gather(*self.user_tasks)
+                await self.scheduler.run(self.config["testrun"]["duration"])
+        finally:
+            for task in self.user_tasks:
+                task.cancel()
+            await asyncio.gather(*[user.stop() for user in self.users])
+
+    async def _run_search(self):
+        self.set_users(self.num_users)
+        await asyncio.gather(*self.user_tasks)
+        search = CapacitySearch(self.config, self.scheduler)
+        scheduler = asyncio.ensure_future(self.scheduler.run())
+        try:
+            await search.run()
+        finally:
+            self.scheduler.stop()
+            await scheduler
+
+    def _set_open_loop_users(self, num_users):
+        if num_users < self.active_users:
+            self.scheduler.remove_users(self.active_users - num_users)
+        for _ in range(num_users - self.active_users):
+            self.user_tasks.append(
+                asyncio.ensure_future(self._start_open_loop_user(self._create_user()))
+            )
+
+    async def _start_open_loop_user(self, user):
+        metrics.USER_ID.set(user.user_id)
+        metrics.ACCOUNT_CLASS.set(user.account.account_class)
+        await user.prerun()
+        self.scheduler.add_user(user)
+
+    async def _run_user(self, instance):
+        metrics.USER_ID.set(instance.user_id)
+        metrics.ACCOUNT_CLASS.set(instance.account.account_class)
+        try:
+            await instance.prerun()
+            await instance.run()
+        except Exception:
+            self.log.error(
+                "User %d stopped: %s",
+                instance.user_id,
+                traceback.format_exc().replace("\n", " "),
+            )
+        finally:
+            await instance.stop()
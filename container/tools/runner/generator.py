@@ -0,0 +1,143 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+
+import actions
+
+
+class RepositoryGenerator:
+    # Fills projects with repositories of a configurable shape, e.g. with deep
+    # histories, many refs and large packs. The repository is generated locally
+    # once per shape and then pushed into each of the configured projects:
+    # branches and tags are pushed directly, the series of changes is pushed for
+    # review in batches, so that the server creates a change for each commit.
+    def __init__(self, test_config):
+        self.log = logging.getLogger("ActionLogger")
+        self.http_config = test_config["http"]
+        self.url = test_config["gerrit"]["url"]
+        self.user = test_config["gerrit"]["user"]
+        self.pwd = test_config["gerrit"]["password"]
+
+        self.config = test_config["generator"]
+        self.content_model = actions.ContentModel(test_config["content"])
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        loop = asyncio.get_event_loop()
+        repo_path = await loop.run_in_executor(None, self._generate)
+        session = actions.create_session(self.http_config)
+        try:
+            for name in self.config["projects"]:
+                await self._fill_project(name, repo_path, session)
+        finally:
+            await session.close()
+
+    def _generate(self):
+        # Generating large repositories takes a while, thus repositories are
+        # kept and reused for all projects of the same shape.
+        shape = "c%d-f%d-b%d-t%d-x%d-p%d" % tuple(
+            self.config[key]
+            for key in (
+                "commits",
+                "files",
+                "branches",
+                "tags",
+                "changes",
+                "pushBatchSize",
+            )
+        )
+        repo_path = os.path.join(self.config["directory"], "%s.git" % shape)
+        if os.path.exists(repo_path):
+            self.log.info("Reusing generated repository %s", repo_path)
+            return repo_path
+
+        tmp_path = repo_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        start = time.monotonic()
+        actions.history_generator.HistoryGenerator(
+            self.config, self.content_model
+        ).generate(tmp_path, self.log)
+        os.rename(tmp_path, repo_path)
+        self.log.info(
+            "Generated repository %s in %.1fs: %s",
+            repo_path,
+            time.monotonic() - start,
+            actions.history_generator.describe(repo_path),
+        )
+        return repo_path
+
+    async def _fill_project(self, name, repo_path, session):
+        action = actions.CreateProjectAction(
+            self.url,
+            self.user,
+            self.pwd,
+            project_name=name,
+            empty_commit=False,
+            exists_ok=True,
+            session=session,
+        )
+        await action.execute()
+        if action.response_status == 409:
+            self.log.info("Project %s already exists, skipping it", name)
+            return
+        if action.failed or not action.was_executed:
+            raise RuntimeError("Creating project %s failed" % name)
+
+        start = time.monotonic()
+        await self._push(
+            name, repo_path, "refs/heads/*:refs/heads/*", "refs/tags/*:refs/tags/*"
+        )
+        for ref in actions.history_generator.changes_refs(repo_path):
+            await self._push(name, repo_path, "%s:refs/for/master" % ref)
+        loop = asyncio.get_event_loop()
+        refs = await loop.run_in_executor(
+            None,
+            actions.git_commands.run,
+            repo_path,
+            "ls-remote",
+            self._assemble_url(name),
+        )
+        self.log.info(
+            "Filled project %s in %.1fs, it advertises %d refs",
+            name,
+            time.monotonic() - start,
+            refs.count(b"\n"),
+        )
+
+    async def _push(self, name, repo_path, *refspecs):
+        start = time.monotonic()
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: actions.git_commands.run(
+                repo_path, "push", "--quiet", self._assemble_url(name), *refspecs
+            ),
+        )
+        self.log.info(
+            "Pushed %s to %s in %.1fs",
+            " ".join(refspecs),
+            name,
+            time.monotonic() - start,
+        )
+
+    def _assemble_url(self, name):
+        url = "%s/%s.git" % (self.url, name)
+        return url.replace("//", "//%s:%s@" % (self.user, self.pwd))
@@ -0,0 +1,281 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+import time
+
+import actions
+
+from .planner import USER_STREAM, WorkloadPlan
+from .sampler import Popularity, PopularitySampler
+
+
+# pylint: disable=W0613
+class LoadTestInstance:
+    def __init__(
+        self,
+        test_config,
+        user_id=0,
+        workspaces=None,
+        change_catalog=None,
+        accounts=None,
+    ):
+        self.config = test_config
+        self.user_id = user_id
+        self.log = logging.getLogger("ActionLogger")
+
+        # Each user acts as the account it is bound to, with its own session.
+        self.url = self.config["gerrit"]["url"]
+        self.accounts = accounts or actions.AccountPool(self.config)
+        self.account = self.accounts.get(self.user_id)
+        self.user = self.account.user
+        self.pwd = self.account.pwd
+
+        self.timeout = (
+            time.time() + self.config["testrun"]["duration"]
+            if self.config["testrun"]["duration"]
+            and not self.config["testrun"]["stages"]
+            else None
+        )
+
+        self.action_config = self.config["actions"]
+        self.plan = WorkloadPlan(self.config, USER_STREAM, self.user_id)
+        self.active = True
+        # Workspaces are shared by all users of a process, so that they can be
+        # kept within a common budget.
+        self.workspaces = workspaces or actions.WorkspaceManager(
+            self.config["testrun"]["workspace"]
+        )
+        self.workspaces.add_listener(self._drop_workspace)
+        self.workdir = os.path.join(self.workspaces.root, "user-%d" % self.user_id)
+        self.change_catalog = change_catalog or actions.ChangeCatalog(self.config)
+
+        popularity_config = self.config["testrun"]["popularity"]
+        self.project_popularity = Popularity(popularity_config["projects"])
+        self.change_popularity = Popularity(popularity_config["changes"])
+        self.content_model = actions.ContentModel(self.config["content"])
+
+        # Projects are ranked in the order, in which they became known, so that
+        # slots of the workload plan select the same projects in every run.
+        self.owned_projects = PopularitySampler(
+            self.project_popularity,
+            self.config["testrun"]["initialization"]["knownProjects"] or list(),
+        )
+        self.cloned_projects = PopularitySampler(self.project_popularity)
+        self.session = None
+
+    async def prerun(self):
+        self.session = actions.create_session(self.config["http"])
+        await self.accounts.ensure_created(self.account, self.session)
+
+        if self.config["testrun"]["initialization"]["delay"]["enabled"]:
+            await self._wait(self.plan.initial_delay())
+
+        if self.config["testrun"]["initialization"]["createProjects"]["enabled"]:
+            await self._create_initial_projects(
+                self.config["testrun"]["initialization"]["createProjects"]["number"]
+            )
+
+    async def run(self):
+        for wait, cycle in self.plan.cycles():
+            if not self.active or (self.timeout and time.time() >= self.timeout):
+                break
+
+            if self.config["testrun"]["waitBetweenCycles"]["enabled"]:
+                await self._wait(wait)
+
+            for action_name, slot in cycle:
+                if self.can_execute(action_name):
+                    await self.execute(action_name, slot=slot)
+
+    def can_execute(self, action_name):
+        if action_name == "clone_project":
+            return bool(self.owned_projects)
+        if action_name in ("fetch_project", "push_head_to_master", "push_for_review"):
+            return bool(self.cloned_projects)
+        return True
+
+    async def execute(self, action_name, intended_start=None, slot=None):
+        executors = {
+            "clone_project": self._exec_clone_project_action,
+            "create_project": self._exec_create_project_action,
+            "fetch_project": self._exec_fetch_project_action,
+            "push_for_review": self._exec_push_change_action,
+            "push_head_to_master": self._exec_push_head_to_master_action,
+            "query_hundred_open_changes": self._exec_query_hundred_open_changes_action,
+            "query_projects": self._exec_list_projects_action,
+            "review_change": self._exec_review_change_action,
+        }
+        await executors[action_name](intended_start, slot)
+
+    async def replay(self, event, intended_start=None):
+        if event.action == "rest":
+            await actions.RestRequestAction(
+                self.url,
+                self.user,
+                self.pwd,
+                event.method,
+                event.path,
+                session=self.session,
+            ).execute(intended_start)
+        elif event.project is None:
+            await self.execute(event.action, intended_start)
+        elif event.project not in self.cloned_projects:
+            # The first access of a user to a project is replayed as a clone.
+            await self._clone_project(event.project, intended_start)
+        elif event.action == "fetch_project":
+            await actions.FetchProjectAction(
+                event.project, 1.0, workdir=self.workdir, workspaces=self.workspaces
+            ).execute(intended_start)
+        else:
+            await actions.PushForReviewAction(
+                event.project,
+                self.content_model,
+                1.0,
+                workdir=self.workdir,
+                workspaces=self.workspaces,
+            ).execute(intended_start)
+
+    async def stop(self):
+        self.workspaces.remove_listener(self._drop_workspace)
+        if self.session:
+            await self.session.close()
+
+    def _drop_workspace(self, path):
+        project_name = os.path.relpath(path, self.workdir)
+        if project_name in self.cloned_projects:
+            self.cloned_projects.remove(project_name)
+
+    async def _create_initial_projects(self, num_init_projects):
+        for _ in range(num_init_projects):
+            self.owned_projects.add(
+                await actions.CreateProjectAction(
+                    self.url, self.user, self.pwd, 1.0, session=self.session
+                ).execute()
+            )
+
+    async def _wait(self, wait_duration):
+        self.log.info("Waiting for %d seconds.", wait_duration)
+        await asyncio.sleep(wait_duration)
+
+    async def _exec_create_project_action(self, intended_start=None, slot=None):
+        action = actions.CreateProjectAction(
+            self.url,
+            self.user,
+            self.pwd,
+            1.0,
+            session=self.session,
+        )
+        project_name = await action.execute(intended_start)
+        if not action.failed and project_name:
+            self.owned_projects.add(project_name)
+
+    async def _exec_list_projects_action(self, intended_start=None, slot=None):
+        query_config = self.action_config["query_projects"]
+        action = actions.QueryProjectsAction(
+            self.url,
+            self.user,
+            self.pwd,
+            1.0,
+            session=self.session,
+            slot=slot,
+            page_size=query_config["pageSize"],
+            max_pages=query_config["pages"],
+        )
+        project_name = await action.execute(intended_start)
+        if not action.failed and project_name:
+            self.owned_projects.add(project_name)
+
+    async def _exec_clone_project_action(self, intended_start=None, slot=None):
+        await self._clone_project(self.owned_projects.sample(slot), intended_start)
+
+    async def _clone_project(self, project_name, intended_start=None):
+        clone_config = self.action_config["clone_project"]
+        action = actions.CloneProjectAction(
+            self.url,
+            self.user,
+            self.pwd,
+            project_name,
+            1.0,
+            workdir=self.workdir,
+            session=self.session,
+            workspaces=self.workspaces,
+            strategy=clone_config["strategy"],
+            depth=clone_config["depth"],
+            blob_filter=clone_config["filter"],
+            object_pool=clone_config["objectPool"],
+            pool_refresh_interval=clone_config["poolRefreshInterval"],
+        )
+        await action.execute(intended_start)
+        if not action.failed and action.was_executed:
+            self.cloned_projects.add(action.project_name)
+
+    async def _exec_fetch_project_action(self, intended_start=None, slot=None):
+        action = actions.FetchProjectAction(
+            self.cloned_projects.sample(slot),
+            1.0,
+            workdir=self.workdir,
+            workspaces=self.workspaces,
+        )
+        await action.execute(intended_start)
+
+    async def _exec_push_head_to_master_action(self, intended_start=None, slot=None):
+        action = actions.PushHeadToMasterAction(
+            self.cloned_projects.sample(slot),
+            self.content_model,
+            1.0,
+            workdir=self.workdir,
+            workspaces=self.workspaces,
+        )
+        await action.execute(intended_start)
+
+    async def _exec_push_change_action(self, intended_start=None, slot=None):
+        action = actions.PushForReviewAction(
+            self.cloned_projects.sample(slot),
+            self.content_model,
+            1.0,
+            workdir=self.workdir,
+            workspaces=self.workspaces,
+        )
+        await action.execute(intended_start)
+
+    async def _exec_query_hundred_open_changes_action(
+        self, intended_start=None, slot=None
+    ):
+        action = actions.QueryHundredOpenChanges(
+            self.url,
+            self.user,
+            self.pwd,
+            1.0,
+            session=self.session,
+            slot=slot,
+            popularity=self.change_popularity,
+        )
+        await action.execute(intended_start)
+
+    async def _exec_review_change_action(self, intended_start=None, slot=None):
+        action = actions.ReviewChangeAction(
+            self.url,
+            self.user,
+            self.pwd,
+            self.change_catalog,
+            1.0,
+            session=self.session,
+            slot=slot,
+            popularity=self.change_popularity,
+            projects=self.cloned_projects,
+        )
+        await action.execute(intended_start)
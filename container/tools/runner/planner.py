@@ -0,0 +1,102 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+# Order, in which actions are run in a cycle of a simulated user in closed-loop
+# mode.
+CYCLE = (
+    "create_project",
+    "query_projects",
+    "clone_project",
+    "fetch_project",
+    "push_head_to_master",
+    "push_for_review",
+    "query_hundred_open_changes",
+    "review_change",
+)
+
+USER_STREAM = 0
+ARRIVAL_STREAM = 1
+
+
+def resolve_seed(test_config):
+    # A random seed is chosen, if none is configured. It is stored in the
+    # configuration, so that it can be logged and passed on to workers.
+    plan_config = test_config["testrun"]["plan"]
+    if plan_config["seed"] is None:
+        plan_config["seed"] = int(np.random.SeedSequence().entropy % 2**63)
+    return plan_config["seed"]
+
+
+class WorkloadPlan:
+    # The workload is drawn in batches from a random generator that is seeded
+    # with the seed of the test run and the key of the stream, e.g. the id of a
+    # simulated user. Thus, test runs with the same seed and configuration are
+    # driven with an identical workload. Slots are drawn uniformly from [0, 1)
+    # and select the project or change an action is run on.
+    def __init__(self, test_config, *stream_key):
+        plan_config = test_config["testrun"]["plan"]
+        self.batch_size = plan_config["batchSize"]
+        self.rng = np.random.default_rng([resolve_seed(test_config), *stream_key])
+
+        self.action_config = test_config["actions"]
+        self.delay_config = test_config["testrun"]["initialization"]["delay"]
+        self.wait_config = test_config["testrun"]["waitBetweenCycles"]
+        self.arrivals = test_config["testrun"]["openLoop"]["arrivals"]
+
+    def initial_delay(self):
+        return int(
+            self.rng.integers(
+                self.delay_config["min"], self.delay_config["max"], endpoint=True
+            )
+        )
+
+    def cycles(self):
+        # Yields the pause before each cycle and the list of actions to run in
+        # the cycle together with their slots.
+        probabilities = np.array(
+            [self.action_config[name]["probability"] for name in CYCLE]
+        )
+        while True:
+            waits = self.rng.integers(
+                self.wait_config["min"],
+                self.wait_config["max"],
+                size=self.batch_size,
+                endpoint=True,
+            )
+            executed = self.rng.random((self.batch_size, len(CYCLE))) < probabilities
+            slots = self.rng.random((self.batch_size, len(CYCLE)))
+            for wait, cycle_executed, cycle_slots in zip(
+                waits.tolist(), executed.tolist(), slots.tolist()
+            ):
+                yield wait, [
+                    (name, slot)
+                    for name, is_executed, slot in zip(
+                        CYCLE, cycle_executed, cycle_slots
+                    )
+                    if is_executed
+                ]
+
+    def arrivals_at_unit_rate(self):
+        # Yields the time until the next arrival at a rate of one action per
+        # second together with the slot of the action. Dividing the times by
+        # the current rate allows to change the rate during the test run.
+        while True:
+            if self.arrivals == "poisson":
+                intervals = self.rng.exponential(1.0, self.batch_size)
+            else:
+                intervals = np.ones(self.batch_size)
+            slots = self.rng.random(self.batch_size)
+            yield from zip(intervals.tolist(), slots.tolist())
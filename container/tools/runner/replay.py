@@ -0,0 +1,283 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import calendar
+import gzip
+import heapq
+import re
+import urllib.parse
+
+import metrics
+
+from .scheduler import DispatchStats, OpenLoopScheduler
+
+# 127.0.0.1 - admin [23/Sep/2019:10:02:43.451 +0200] "GET /a/changes/ HTTP/1.1" 200 ...
+# 127.0.0.1 [HTTP-123] - admin [23/Sep/2019:10:02:43.451 +0200] "GET /a/changes/ ...
+HTTPD_LOG_PATTERN = re.compile(
+    r'^\S+ (?:\[[^\]]*\] )?\S+ (?P<user>\S+) \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)'
+)
+# [2019-09-23 10:02:43,451 +0200] 9b5b6a44 admin a/1000000 git-upload-pack./foo 2ms ...
+SSHD_LOG_PATTERN = re.compile(
+    r"^\[(?P<time>[^\]]+)\] \S+ (?P<user>\S+) \S+ (?P<command>'[^']*'|\S+)"
+)
+HTTPD_TIME_PATTERN = re.compile(
+    r"(?P<day>\d+)/(?P<month>\w+)/(?P<year>\d+):(?P<hour>\d+):(?P<minute>\d+):"
+    r"(?P<second>\d+)(?:\.(?P<fraction>\d+))? (?P<offset>[+-]\d{4})"
+)
+SSHD_TIME_PATTERN = re.compile(
+    r"(?P<year>\d+)-(?P<month>\d+)-(?P<day>\d+) (?P<hour>\d+):(?P<minute>\d+):"
+    r"(?P<second>\d+)(?:,(?P<fraction>\d+))? (?P<offset>[+-]\d{4})"
+)
+UNMAPPED_YIELD_INTERVAL = 1000
+MONTHS = {
+    name: i + 1
+    for i, name in enumerate("Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split())
+}
+
+GIT_HTTP_PATTERN = re.compile(
+    r"^/(?:a/)?(?P<project>.+?)(?:\.git)?/info/refs\?service=(?P<service>git-\S+)$"
+)
+PROJECT_PATTERN = re.compile(r"^/(?:a/)?projects/(?P<project>[^/?]+)$")
+REVIEW_PATTERN = re.compile(r"^/(?:a/)?changes/[^/]+/revisions/[^/]+/review$")
+WRITE_REQUESTS = (
+    ("PUT", PROJECT_PATTERN, "create_project"),
+    ("POST", REVIEW_PATTERN, "review_change"),
+)
+GIT_SERVICES = {
+    "git-upload-pack": "fetch_project",
+    "git-receive-pack": "push_for_review",
+}
+SSH_COMMANDS = {
+    "gerrit ls-projects": "query_projects",
+    "gerrit query": "query_hundred_open_changes",
+    "gerrit review": "review_change",
+    "gerrit create-project": "create_project",
+}
+WRITE_ACTIONS = ("create_project", "review_change", "push_for_review")
+
+
+class ReplayEvent:
+    __slots__ = ("timestamp", "action", "project", "method", "path")
+
+    def __init__(self, timestamp, action, project=None, method=None, path=None):
+        self.timestamp = timestamp
+        self.action = action
+        self.project = project
+        self.method = method
+        self.path = path
+
+
+def _parse_time(pattern, value):
+    match = pattern.match(value)
+    if not match:
+        return None
+    fields = match.groupdict()
+    timestamp = calendar.timegm(
+        (
+            int(fields["year"]),
+            MONTHS.get(fields["month"]) or int(fields["month"]),
+            int(fields["day"]),
+            int(fields["hour"]),
+            int(fields["minute"]),
+            int(fields["second"]),
+        )
+    )
+    if fields["fraction"]:
+        timestamp += int(fields["fraction"]) / 10 ** len(fields["fraction"])
+    offset = fields["offset"]
+    offset_seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+    return (
+        timestamp - offset_seconds if offset[0] == "+" else timestamp + offset_seconds
+    )
+
+
+def _map_http_request(method, path):
+    git_match = GIT_HTTP_PATTERN.match(path)
+    if git_match:
+        if git_match.group("service") not in GIT_SERVICES:
+            return None
+        return (
+            GIT_SERVICES[git_match.group("service")],
+            urllib.parse.unquote(git_match.group("project")),
+        )
+    if method in ("GET", "HEAD"):
+        # Requests of the git protocol following the ref advertisement are
+        # covered by the fetch or push of the project.
+        if "/git-upload-pack" in path or "/git-receive-pack" in path:
+            return None
+        return "rest", None
+    for write_method, pattern, action in WRITE_REQUESTS:
+        if method == write_method and pattern.match(path):
+            return action, None
+    return None
+
+
+def _map_ssh_command(command):
+    command = command.strip("'")
+    for service, action in GIT_SERVICES.items():
+        if command.startswith(service):
+            project = command[len(service) :].lstrip(". '/").rstrip("'")
+            if project.endswith(".git"):
+                project = project[: -len(".git")]
+            return action, project
+
+    # Gerrit logs the arguments of commands separated by dots.
+    command = command.replace(".", " ", 2)
+    for prefix, action in SSH_COMMANDS.items():
+        if command.startswith(prefix):
+            return action, None
+    return None
+
+
+def read_httpd_log(lines):
+    for line in lines:
+        match = HTTPD_LOG_PATTERN.match(line)
+        if not match:
+            continue
+        timestamp = _parse_time(HTTPD_TIME_PATTERN, match.group("time"))
+        mapping = _map_http_request(match.group("method"), match.group("path"))
+        if timestamp is None or not mapping:
+            yield ReplayEvent(timestamp, None)
+            continue
+        action, project = mapping
+        yield ReplayEvent(
+            timestamp, action, project, match.group("method"), match.group("path")
+        )
+
+
+def read_sshd_log(lines):
+    for line in lines:
+        match = SSHD_LOG_PATTERN.match(line)
+        if not match:
+            continue
+        command = match.group("command")
+        if command in ("LOGIN", "LOGOUT", "AUTH"):
+            continue
+        timestamp = _parse_time(SSHD_TIME_PATTERN, match.group("time"))
+        mapping = _map_ssh_command(command)
+        if timestamp is None or not mapping:
+            yield ReplayEvent(timestamp, None)
+            continue
+        action, project = mapping
+        yield ReplayEvent(timestamp, action, project)
+
+
+def _read_log(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        first_line = f.readline()
+        if not first_line:
+            return
+        reader = read_sshd_log if first_line.startswith("[") else read_httpd_log
+        last_timestamp = None
+        for event in reader(_lines(first_line, f)):
+            # Unmapped lines are passed on to count them, but do not have to
+            # have a valid timestamp.
+            if event.timestamp is None:
+                event.timestamp = last_timestamp
+                if event.timestamp is None:
+                    continue
+            last_timestamp = event.timestamp
+            yield event
+
+
+def _lines(first_line, f):
+    yield first_line
+    yield from f
+
+
+def read_events(paths):
+    # Log files are read lazily and merged by time, so that only one event per
+    # file is held in memory at a time.
+    return heapq.merge(
+        *[_read_log(path) for path in paths], key=lambda event: event.timestamp
+    )
+
+
+class LogReplayer(OpenLoopScheduler):
+    # Replays requests recorded in Gerrit's httpd_log and sshd_log files with
+    # their original inter-arrival times divided by the replay speed. Requests
+    # are dispatched to idle simulated users like in open-loop mode.
+    def __init__(self, test_config, users, stream_id=0):
+        super().__init__(test_config, users, stream_id)
+        replay_config = test_config["testrun"]["replay"]
+        self.paths = replay_config["files"]
+        self.speed = replay_config["speed"]
+        self.include_writes = replay_config["includeWrites"]
+        self.stats = dict()
+        self.rates = dict()
+        self.unmapped = 0
+
+    async def run(self, duration=None):
+        loop = asyncio.get_event_loop()
+        end = loop.time() + duration if duration else None
+        reporter = asyncio.ensure_future(self._report_periodically())
+
+        start = loop.time()
+        first_timestamp = None
+        for index, event in enumerate(read_events(self.paths)):
+            if self.stopped:
+                break
+            if first_timestamp is None:
+                first_timestamp = event.timestamp
+            if not event.action or (
+                event.action in WRITE_ACTIONS and not self.include_writes
+            ):
+                self.unmapped += 1
+                # Skipping lines does not yield, thus long runs of unmapped
+                # lines would otherwise block the event loop.
+                if not index % UNMAPPED_YIELD_INTERVAL:
+                    await asyncio.sleep(0)
+                continue
+
+            intended_start = start + (event.timestamp - first_timestamp) / self.speed
+            if end and intended_start >= end:
+                break
+            # The loop yields even when it lags behind the log, so that the
+            # dispatched requests and the reporter get to run.
+            await asyncio.sleep(max(intended_start - loop.time(), 0))
+            if event.action not in self.stats:
+                self.stats[event.action] = DispatchStats()
+            self._dispatch(
+                event.action, intended_start, event, loop.time() - intended_start
+            )
+
+        reporter.cancel()
+        if self.in_flight:
+            await asyncio.wait(self.in_flight)
+        self._report()
+
+    async def _execute(self, user, action_name, intended_start, slot):
+        metrics.USER_ID.set(user.user_id)
+        metrics.ACCOUNT_CLASS.set(user.account.account_class)
+        try:
+            await user.replay(slot, intended_start)
+            self.stats[action_name].completed += 1
+        finally:
+            self.add_user(user)
+
+    def _report(self):
+        for action_name, stats in sorted(self.stats.items()):
+            self.log.info(
+                "Replay %s dispatched=%d late=%d dropped=%d lag_mean=%.2fms "
+                "lag_max=%.2fms",
+                action_name,
+                stats.dispatched,
+                stats.late,
+                stats.dropped,
+                stats.mean_lag() * 1000,
+                stats.lag_max * 1000,
+            )
+        self.log.info("Replay unmapped=%d", self.unmapped)
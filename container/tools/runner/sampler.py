@@ -0,0 +1,168 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import random
+
+
+class Popularity:
+    # Assigns a fixed weight to an entity based on its rank, i.e. the position
+    # in which it became known. With a zipf distribution, the weight of an
+    # entity is proportional to 1 / (rank + 1) ^ exponent. With a hotspot
+    # distribution, the first hotCount entities are hotFactor times as popular
+    # as the others.
+    def __init__(self, popularity_config):
+        self.distribution = popularity_config["distribution"]
+        self.exponent = popularity_config["exponent"]
+        self.hot_count = popularity_config["hotCount"]
+        self.hot_factor = popularity_config["hotFactor"]
+        if self.distribution not in ("uniform", "zipf", "hotspot"):
+            raise ValueError("Unknown popularity distribution: %s" % self.distribution)
+
+        # Cumulative weights of the most recent number of items only, since
+        # the number of items mostly grows.
+        self.num_items = None
+        self.cumulative_weights = None
+
+    def weight(self, rank):
+        if self.distribution == "zipf":
+            return 1.0 / (rank + 1) ** self.exponent
+        if self.distribution == "hotspot" and rank < self.hot_count:
+            return float(self.hot_factor)
+        return 1.0
+
+    def index(self, slot, num_items):
+        # Selects one of num_items ranked items, e.g. changes in the order
+        # returned by Gerrit.
+        if num_items != self.num_items:
+            cumulative_weights = list()
+            total = 0.0
+            for rank in range(num_items):
+                total += self.weight(rank)
+                cumulative_weights.append(total)
+            self.num_items = num_items
+            self.cumulative_weights = cumulative_weights
+        cumulative_weights = self.cumulative_weights
+        return min(
+            bisect.bisect_right(cumulative_weights, slot * cumulative_weights[-1]),
+            num_items - 1,
+        )
+
+
+class PopularitySampler:
+    # Set of entities that are sampled according to their popularity. The
+    # weights are kept in a Fenwick tree, so that adding, removing and sampling
+    # entities takes O(log n). Removed entities keep their rank, so that the
+    # popularity of the remaining entities does not change, and get their rank
+    # back when they are added again, e.g. when an evicted project is cloned
+    # again.
+    def __init__(self, popularity, items=()):
+        self.popularity = popularity
+        self.items = list()
+        self.weights = list()
+        self.positions = dict()
+        self.ranks = dict()
+        self.tree = [0.0]
+        self.total = 0.0
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def add(self, item):
+        if item in self.positions:
+            return
+        if item in self.ranks:
+            position = self.ranks[item]
+            weight = self.popularity.weight(position)
+            self.items[position] = item
+            self.weights[position] = weight
+            self.positions[item] = position
+            self._update(position, weight)
+            return
+
+        position = len(self.items)
+        weight = self.popularity.weight(position)
+        self.items.append(item)
+        self.weights.append(weight)
+        self.positions[item] = position
+        self.ranks[item] = position
+
+        # The new node covers the weights of the positions from
+        # position + 1 - lowbit(position + 1) up to position.
+        node = position + 1
+        self.tree.append(
+            weight
+            + self._prefix_sum(position)
+            - self._prefix_sum(node - (node & -node))
+        )
+        self.total += weight
+
+    def remove(self, item):
+        position = self.positions.pop(item)
+        weight = self.weights[position]
+        self.items[position] = None
+        self.weights[position] = 0.0
+        self._update(position, -weight)
+
+    def sample(self, slot=None):
+        if not self.positions:
+            raise IndexError("Cannot sample from an empty set.")
+        if slot is None:
+            slot = random.random()
+
+        # Finds the first position, at which the prefix sum of the weights
+        # exceeds the target, by descending the tree.
+        target = slot * self.total
+        position = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            node = position + step
+            if node < len(self.tree) and self.tree[node] <= target:
+                position = node
+                target -= self.tree[node]
+            step >>= 1
+
+        # Rounding errors may point past the last or to a removed entity, in
+        # which case the closest entity below or else above is chosen.
+        position = min(position, len(self.items) - 1)
+        below = position
+        while below >= 0 and self.items[below] is None:
+            below -= 1
+        if below >= 0:
+            return self.items[below]
+        while self.items[position] is None:
+            position += 1
+        return self.items[position]
+
+    def _update(self, position, delta):
+        node = position + 1
+        while node < len(self.tree):
+            self.tree[node] += delta
+            node += node & -node
+        self.total += delta
+
+    def _prefix_sum(self, node):
+        total = 0.0
+        while node > 0:
+            total += self.tree[node]
+            node -= node & -node
+        return total
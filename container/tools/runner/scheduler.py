@@ -0,0 +1,191 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import logging
+
+import metrics
+
+from .planner import ARRIVAL_STREAM, WorkloadPlan
+
+# Interval in seconds, in which actions with a target rate of 0 are checked for
+# a changed rate.
+IDLE_INTERVAL = 1
+
+
+class DispatchStats:
+    def __init__(self):
+        self.dispatched = 0
+        self.late = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.completed = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+    def record_dispatch(self, lag, late):
+        self.dispatched += 1
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        if late:
+            self.late += 1
+
+    def mean_lag(self):
+        return self.lag_total / self.dispatched if self.dispatched else 0.0
+
+
+class OpenLoopScheduler:
+    def __init__(self, test_config, users, stream_id=0):
+        self.log = logging.getLogger("ActionLogger")
+
+        open_loop_config = test_config["testrun"]["openLoop"]
+        self.late_threshold = open_loop_config["lateThreshold"] / 1000
+        self.report_interval = open_loop_config["reportInterval"]
+
+        self.rates = {
+            name: action["rate"] for name, action in test_config["actions"].items()
+        }
+        self.rate_scale = 1.0
+        self.stats = {name: DispatchStats() for name in self.rates}
+        self.plans = {
+            name: WorkloadPlan(
+                test_config, ARRIVAL_STREAM, stream_id, i
+            ).arrivals_at_unit_rate()
+            for i, name in enumerate(sorted(self.rates))
+        }
+
+        self.idle_users = collections.deque(users)
+        self.excess_users = 0
+        self.in_flight = set()
+        self.stopped = False
+
+    async def run(self, duration=None):
+        loop = asyncio.get_event_loop()
+        end = loop.time() + duration if duration else None
+
+        reporter = asyncio.ensure_future(self._report_periodically())
+        await asyncio.gather(
+            *[self._generate_arrivals(name, end) for name in self.rates]
+        )
+        reporter.cancel()
+
+        if self.in_flight:
+            await asyncio.wait(self.in_flight)
+        self._report()
+
+    async def _generate_arrivals(self, action_name, end):
+        loop = asyncio.get_event_loop()
+        intended_start = loop.time()
+        while not self.stopped and (not end or intended_start < end):
+            rate = self.rates[action_name] * self.rate_scale
+            if rate <= 0:
+                await asyncio.sleep(IDLE_INTERVAL)
+                intended_start = loop.time()
+                continue
+
+            interval, slot = next(self.plans[action_name])
+            intended_start += interval / rate
+
+            # Wait in short steps, so that changes of the rate take effect
+            # without waiting for an arrival drawn from the former rate.
+            wait_until = min(intended_start, end) if end else intended_start
+            while (
+                loop.time() < wait_until
+                and rate == self.rates[action_name] * self.rate_scale
+                and not self.stopped
+            ):
+                await asyncio.sleep(min(wait_until - loop.time(), IDLE_INTERVAL))
+            if loop.time() < wait_until:
+                intended_start = loop.time()
+                continue
+            if end and intended_start >= end:
+                break
+            self._dispatch(
+                action_name, intended_start, slot, loop.time() - intended_start
+            )
+
+    def stop(self):
+        self.stopped = True
+
+    def add_user(self, user):
+        if self.excess_users:
+            self.excess_users -= 1
+        else:
+            self.idle_users.append(user)
+
+    def remove_users(self, num_users):
+        # Busy users are removed as soon as they finish their current action.
+        while num_users and self.idle_users:
+            self.idle_users.pop()
+            num_users -= 1
+        self.excess_users += num_users
+
+    def set_rates(self, rates=None, scale=None):
+        if rates:
+            self.rates.update(rates)
+        if scale is not None:
+            self.rate_scale = scale
+        self.log.info(
+            "Scheduler rates changed: scale=%.2f %s",
+            self.rate_scale,
+            " ".join("%s=%.2f/s" % item for item in sorted(self.rates.items())),
+        )
+
+    def _dispatch(self, action_name, intended_start, slot, lag):
+        stats = self.stats[action_name]
+        if not self.idle_users:
+            stats.dropped += 1
+            return
+
+        stats.record_dispatch(lag, lag > self.late_threshold)
+        task = asyncio.ensure_future(
+            self._execute(self.idle_users.popleft(), action_name, intended_start, slot)
+        )
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def _execute(self, user, action_name, intended_start, slot):
+        metrics.USER_ID.set(user.user_id)
+        metrics.ACCOUNT_CLASS.set(user.account.account_class)
+        try:
+            if user.can_execute(action_name):
+                await user.execute(action_name, intended_start, slot)
+                self.stats[action_name].completed += 1
+            else:
+                self.stats[action_name].skipped += 1
+        finally:
+            self.add_user(user)
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self._report()
+
+    def _report(self):
+        for action_name, stats in self.stats.items():
+            if not self.rates[action_name] and not stats.dispatched:
+                continue
+            self.log.info(
+                "Scheduler %s rate=%.2f/s dispatched=%d late=%d dropped=%d "
+                "skipped=%d lag_mean=%.2fms lag_max=%.2fms",
+                action_name,
+                self.rates[action_name] * self.rate_scale,
+                stats.dispatched,
+                stats.late,
+                stats.dropped,
+                stats.skipped,
+                stats.mean_lag() * 1000,
+                stats.lag_max * 1000,
+            )
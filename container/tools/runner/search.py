@@ -0,0 +1,243 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+
+import metrics
+
+
+class SearchStep:
+    def __init__(self, rate, duration):
+        self.rate = rate
+        self.duration = duration
+        self.count = 0
+        self.failed = 0
+        self.completed = 0
+        self.dropped = 0
+        self.response_time = None
+        self.violations = list()
+
+    @property
+    def passed(self):
+        return not self.violations
+
+    @property
+    def throughput(self):
+        return self.completed / self.duration
+
+    @property
+    def error_rate(self):
+        return self.failed / self.count if self.count else 0.0
+
+
+class CapacitySearch:
+    # The offered load is increased by a constant factor as long as the SLOs
+    # hold. Afterwards the capacity is narrowed down by bisecting between the
+    # highest load that passed and the lowest load that failed. Each load is
+    # held for a fixed time after a warmup period and the results of that time
+    # are compared to the SLOs for each action type.
+    def __init__(self, test_config, scheduler):
+        self.log = logging.getLogger("ActionLogger")
+        self.scheduler = scheduler
+        self.metrics_config = test_config["metrics"]
+
+        search_config = test_config["testrun"]["search"]
+        self.initial_rate = search_config["initialRate"]
+        self.step_factor = search_config["stepFactor"]
+        self.max_rate = search_config["maxRate"]
+        self.max_steps = search_config["maxSteps"]
+        self.tolerance = search_config["tolerance"] / 100
+        self.warmup = search_config["warmup"]
+        self.hold_duration = search_config["holdDuration"]
+        self.slo_p99 = search_config["sloP99"] / 1000
+        self.slo_error_rate = search_config["sloErrorRate"] / 100
+
+        self.mix = self._action_mix(test_config["actions"])
+        self.steps = list()
+
+    @staticmethod
+    def _action_mix(action_config):
+        # The rates of the actions are used as their share of the load. If no
+        # rates are configured, the probabilities are used instead.
+        weights = {name: action["rate"] for name, action in action_config.items()}
+        if not any(weights.values()):
+            weights = {
+                name: action["probability"] for name, action in action_config.items()
+            }
+        total = sum(weights.values())
+        if not total:
+            raise ValueError("No action is configured to be executed.")
+        return {name: weight / total for name, weight in weights.items()}
+
+    async def run(self):
+        # Base rates of the scheduler are set to the action mix, i.e. the rate
+        # scale is equal to the total offered rate.
+        self.scheduler.set_rates(rates=self.mix, scale=0.0)
+
+        passed = None
+        failed = None
+        rate = self.initial_rate
+        while len(self.steps) < self.max_steps:
+            step = await self._run_step(rate)
+            if step.passed:
+                if not passed or step.rate > passed.rate:
+                    passed = step
+            elif not failed or step.rate < failed.rate:
+                failed = step
+
+            if not failed:
+                if rate >= self.max_rate:
+                    break
+                rate = min(rate * self.step_factor, self.max_rate)
+            else:
+                lower = passed.rate if passed else 0.0
+                if failed.rate - lower <= self.tolerance * failed.rate:
+                    break
+                rate = (lower + failed.rate) / 2
+
+        self.scheduler.set_rates(scale=0.0)
+        metrics.set_stage(None)
+        self._report(passed, failed)
+
+    async def _run_step(self, rate):
+        step = SearchStep(rate, self.hold_duration)
+        metrics.set_stage("search-%d" % len(self.steps))
+        self.scheduler.rate_scale = rate
+        self.log.info("Search step %d started: rate=%.2f/s", len(self.steps), step.rate)
+        await asyncio.sleep(self.warmup)
+
+        collector = metrics.Collector(self.metrics_config)
+        completed, dropped = self._dispatch_counts()
+        metrics.add_listener(collector)
+        try:
+            await asyncio.sleep(self.hold_duration)
+        finally:
+            metrics.remove_listener(collector)
+        step.completed = self._dispatch_counts()[0] - completed
+        step.dropped = self._dispatch_counts()[1] - dropped
+
+        self._evaluate(step, collector.total_statistics)
+        self.steps.append(step)
+        self.log.info(
+            "Search step %d finished: rate=%.2f/s throughput=%.2f/s p99_ms=%.2f "
+            "error_rate=%.2f%% dropped=%d result=%s %s",
+            len(self.steps) - 1,
+            step.rate,
+            step.throughput,
+            step.response_time.percentile(99) * 1000,
+            step.error_rate * 100,
+            step.dropped,
+            "PASS" if step.passed else "FAIL",
+            " ".join(violation for _, violation in step.violations),
+        )
+        return step
+
+    def _dispatch_counts(self):
+        stats = self.scheduler.stats.values()
+        return sum(s.completed for s in stats), sum(s.dropped for s in stats)
+
+    def _evaluate(self, step, statistics):
+        highest_trackable_value = self.metrics_config["highestTrackableLatency"]
+        step.response_time = metrics.LatencyHistogram(highest_trackable_value)
+        actions = {
+            action for action, _ in statistics if not metrics.split_phase(action)[1]
+        }
+        for action in sorted(actions):
+            response_time = metrics.LatencyHistogram(highest_trackable_value)
+            count = failed = 0
+            for status in ("OK", "FAILED"):
+                if (action, status) not in statistics:
+                    continue
+                action_statistics = statistics[(action, status)]
+                response_time.merge(action_statistics.response_time)
+                count += action_statistics.count
+                if status == "FAILED":
+                    failed += action_statistics.count
+            step.response_time.merge(response_time)
+            step.count += count
+            step.failed += failed
+
+            p99 = response_time.percentile(99)
+            if p99 > self.slo_p99:
+                step.violations.append(
+                    (
+                        p99 / self.slo_p99,
+                        "%s:p99=%.2fms>%.2fms"
+                        % (action, p99 * 1000, self.slo_p99 * 1000),
+                    )
+                )
+            error_rate = failed / count
+            if error_rate > self.slo_error_rate:
+                step.violations.append(
+                    (
+                        error_rate / self.slo_error_rate,
+                        "%s:error_rate=%.2f%%>%.2f%%"
+                        % (action, error_rate * 100, self.slo_error_rate * 100),
+                    )
+                )
+
+        # Dropped dispatches mean that the simulated users cannot offer the
+        # load, which would otherwise be mistaken for sustained throughput.
+        drop_rate = step.dropped / (step.rate * step.duration)
+        if drop_rate > self.slo_error_rate:
+            step.violations.append(
+                (
+                    drop_rate / self.slo_error_rate,
+                    "scheduler:dropped=%.2f%%>%.2f%%"
+                    % (drop_rate * 100, self.slo_error_rate * 100),
+                )
+            )
+        # The action exceeding its SLO the most is listed first.
+        step.violations.sort(reverse=True)
+
+    def _report(self, passed, failed):
+        self.log.info("Search curve:")
+        self.log.info(
+            "%10s %12s %10s %10s %10s %8s",
+            "rate/s",
+            "throughput/s",
+            "p50_ms",
+            "p99_ms",
+            "errors_%",
+            "result",
+        )
+        for step in sorted(self.steps, key=lambda step: step.rate):
+            self.log.info(
+                "%10.2f %12.2f %10.2f %10.2f %10.2f %8s",
+                step.rate,
+                step.throughput,
+                step.response_time.percentile(50) * 1000,
+                step.response_time.percentile(99) * 1000,
+                step.error_rate * 100,
+                "PASS" if step.passed else "FAIL",
+            )
+
+        if passed:
+            self.log.info(
+                "Search result: capacity=%.2f/s throughput=%.2f/s p99_ms=%.2f",
+                passed.rate,
+                passed.throughput,
+                passed.response_time.percentile(99) * 1000,
+            )
+        else:
+            self.log.info("Search result: SLOs were violated at every tested rate.")
+        if failed:
+            self.log.info(
+                "Search first violation at rate=%.2f/s: %s",
+                failed.rate,
+                " ".join(violation for _, violation in failed.violations),
+            )
+        else:
+            self.log.info("Search found no violation up to rate=%.2f/s", self.max_rate)
@@ -0,0 +1,282 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import json
+import logging
+import os
+import time
+import traceback
+
+import actions
+
+
+class ProjectProgress:
+    __slots__ = ("created", "changes", "reviews")
+
+    def __init__(self, created=False, changes=0, reviews=None):
+        self.created = created
+        self.changes = changes
+        # Number of reviews posted per change id
+        self.reviews = reviews or dict()
+
+
+# pylint: disable=W0703
+class Seeder:
+    # Fills a test site with projects, changes and reviews. A number of workers
+    # seed one project at a time each: the project is created and cloned,
+    # changes are pushed in batches of the content model's commits per push and
+    # each change is reviewed. The progress of each project is checkpointed, so
+    # that an interrupted seeding continues where it stopped.
+    def __init__(self, test_config, workspaces, change_catalog):
+        self.log = logging.getLogger("ActionLogger")
+        self.http_config = test_config["http"]
+        self.clone_config = test_config["actions"]["clone_project"]
+        self.url = test_config["gerrit"]["url"]
+        self.user = test_config["gerrit"]["user"]
+        self.pwd = test_config["gerrit"]["password"]
+        self.workspaces = workspaces
+        self.change_catalog = change_catalog
+        self.content_model = actions.ContentModel(test_config["content"])
+
+        seed_config = test_config["testrun"]["seed"]
+        self.num_projects = seed_config["projects"]
+        self.project_prefix = seed_config["projectPrefix"]
+        self.changes_per_project = seed_config["changesPerProject"]
+        self.reviews_per_change = seed_config["reviewsPerChange"]
+        self.parallelism = seed_config["parallelism"]
+        self.retries = seed_config["retries"]
+        self.checkpoint = seed_config["checkpoint"]
+        self.report_interval = seed_config["reportInterval"]
+
+        self.progress = dict()
+        self.seeded = collections.Counter()
+        self.failed_projects = list()
+
+    async def run(self):
+        self._load_checkpoint()
+        queue = asyncio.Queue()
+        for i in range(self.num_projects):
+            name = "%s-%06d" % (self.project_prefix, i)
+            if not self._is_complete(self.progress.get(name)):
+                queue.put_nowait(name)
+        self.log.info(
+            "Seeding %d of %d projects with %d workers",
+            queue.qsize(),
+            self.num_projects,
+            self.parallelism,
+        )
+
+        start = time.monotonic()
+        reporter = asyncio.ensure_future(self._report_periodically(start))
+        try:
+            await asyncio.gather(
+                *[self._run_worker(worker, queue) for worker in range(self.parallelism)]
+            )
+        finally:
+            reporter.cancel()
+            await self._save_checkpoint()
+            self._report(start)
+        if self.failed_projects:
+            self.log.warning(
+                "Seeding of %d projects failed, run again to resume: %s",
+                len(self.failed_projects),
+                " ".join(sorted(self.failed_projects)),
+            )
+
+    def _is_complete(self, progress):
+        return (
+            progress is not None
+            and progress.created
+            and progress.changes >= self.changes_per_project
+            and sum(progress.reviews.values())
+            >= self.changes_per_project * self.reviews_per_change
+        )
+
+    async def _run_worker(self, worker, queue):
+        session = actions.create_session(self.http_config)
+        workdir = os.path.join(self.workspaces.root, "seed-%d" % worker)
+        try:
+            while not queue.empty():
+                name = queue.get_nowait()
+                try:
+                    await self._seed_project(name, session, workdir)
+                except Exception:
+                    self.failed_projects.append(name)
+                    self.log.error(
+                        "Seeding of project %s failed: %s",
+                        name,
+                        traceback.format_exc().replace("\n", " "),
+                    )
+        finally:
+            await session.close()
+
+    async def _seed_project(self, name, session, workdir):
+        progress = self.progress.setdefault(name, ProjectProgress())
+        if not progress.created:
+            # The project may have been created before the last checkpoint.
+            await self._execute(
+                lambda: actions.CreateProjectAction(
+                    self.url,
+                    self.user,
+                    self.pwd,
+                    session=session,
+                    project_name=name,
+                    exists_ok=True,
+                )
+            )
+            progress.created = True
+            self.seeded["projects"] += 1
+
+        if progress.changes < self.changes_per_project:
+            await self._push_changes(name, progress, session, workdir)
+
+        num_reviews = self.changes_per_project * self.reviews_per_change
+        if sum(progress.reviews.values()) < num_reviews:
+            # Reviews are counted per change, so that an interrupted or
+            # extended seeding only reviews the changes lacking reviews.
+            changes = await self.change_catalog.query(
+                "project:%s" % name, self.changes_per_project
+            )
+            for change in changes:
+                reviewed = progress.reviews.get(change.change_id, 0)
+                for _ in range(reviewed, self.reviews_per_change):
+                    await self._execute(
+                        lambda change=change: actions.ReviewChangeAction(
+                            self.url,
+                            self.user,
+                            self.pwd,
+                            self.change_catalog,
+                            session=session,
+                            change=change,
+                        )
+                    )
+                    progress.reviews[change.change_id] = (
+                        progress.reviews.get(change.change_id, 0) + 1
+                    )
+                    self.seeded["reviews"] += 1
+
+    async def _push_changes(self, name, progress, session, workdir):
+        await self._execute(
+            lambda: actions.CloneProjectAction(
+                self.url,
+                self.user,
+                self.pwd,
+                name,
+                1.0,
+                workdir=workdir,
+                session=session,
+                workspaces=self.workspaces,
+                strategy=self.clone_config["strategy"],
+                depth=self.clone_config["depth"],
+                blob_filter=self.clone_config["filter"],
+                object_pool=self.clone_config["objectPool"],
+                pool_refresh_interval=self.clone_config["poolRefreshInterval"],
+            )
+        )
+        try:
+            # Each pushed commit becomes a change.
+            while progress.changes < self.changes_per_project:
+                num_commits = min(
+                    max(self.content_model.commits_per_push.draw(), 1),
+                    self.changes_per_project - progress.changes,
+                )
+                await self._execute(
+                    lambda: actions.PushForReviewAction(
+                        name,
+                        self.content_model,
+                        workdir=workdir,
+                        workspaces=self.workspaces,
+                        num_commits=num_commits,
+                    )
+                )
+                progress.changes += num_commits
+                self.seeded["changes"] += num_commits
+        finally:
+            await self.workspaces.discard(os.path.join(workdir, name))
+
+    async def _execute(self, create_action):
+        # Actions are retried with a new instance, since each instance is only
+        # executed once.
+        for attempt in range(self.retries + 1):
+            action = create_action()
+            await action.execute()
+            if action.was_executed and not action.failed:
+                return
+            self.log.info(
+                "%s failed (attempt %d of %d)",
+                action.__class__.__name__,
+                attempt + 1,
+                self.retries + 1,
+            )
+        raise RuntimeError("%s failed" % action.__class__.__name__)
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint, "r") as f:
+            checkpoint = json.load(f)
+        for name, progress in checkpoint["projects"].items():
+            self.progress[name] = ProjectProgress(**progress)
+        self.log.info(
+            "Resuming seeding from checkpoint %s with %d projects",
+            self.checkpoint,
+            len(self.progress),
+        )
+
+    async def _save_checkpoint(self):
+        # The checkpoint is built from copies on the event loop, since the
+        # workers keep updating the progress, while it is written.
+        checkpoint = {
+            "projects": {
+                name: {
+                    "created": progress.created,
+                    "changes": progress.changes,
+                    "reviews": dict(progress.reviews),
+                }
+                for name, progress in self.progress.items()
+            }
+        }
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, _write_atomically, self.checkpoint, checkpoint)
+
+    async def _report_periodically(self, start):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            await self._save_checkpoint()
+            self._report(start)
+
+    def _report(self, start):
+        duration = max(time.monotonic() - start, 1e-9)
+        self.log.info(
+            "Seeded projects=%d (%.2f/s) changes=%d (%.2f/s) reviews=%d (%.2f/s) "
+            "in %.1fs, failed projects=%d",
+            self.seeded["projects"],
+            self.seeded["projects"] / duration,
+            self.seeded["changes"],
+            self.seeded["changes"] / duration,
+            self.seeded["reviews"],
+            self.seeded["reviews"] / duration,
+            duration,
+            len(self.failed_projects),
+        )
+
+
+def _write_atomically(path, content):
+    # The checkpoint is replaced at once, so that it is never left incomplete.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(content, f)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,76 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+
+import metrics
+
+
+class StageController:
+    # Stages are run one after another. Each stage defines the number of
+    # simulated users and the factor, by which the target rates of actions are
+    # scaled. If a stage is a ramp, both values are linearly adjusted from the
+    # values of the previous stage to the ones of the stage over its duration.
+    # Otherwise they are applied at once when the stage starts.
+    def __init__(self, stages, default_users, update_interval, set_users, set_scale):
+        self.log = logging.getLogger("ActionLogger")
+        self.stages = stages
+        self.default_users = default_users
+        self.update_interval = update_interval
+        self.set_users = set_users
+        self.set_scale = set_scale
+
+    @property
+    def duration(self):
+        return sum(stage["duration"] for stage in self.stages)
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        users = 0
+        scale = 0.0
+        stage_start = loop.time()
+        for i, stage in enumerate(self.stages):
+            name = stage.get("name", "stage-%d" % i)
+            target_users = stage.get("users", self.default_users)
+            target_scale = stage.get("rateScale", 1.0)
+            stage_end = stage_start + stage["duration"]
+
+            metrics.set_stage(name)
+            self.log.info(
+                "Stage %s started: users=%d rate_scale=%.2f duration=%ds ramp=%s",
+                name,
+                target_users,
+                target_scale,
+                stage["duration"],
+                stage.get("ramp", False),
+            )
+
+            if stage.get("ramp", False):
+                now = loop.time()
+                while now < stage_end:
+                    fraction = (now - stage_start) / stage["duration"]
+                    self.set_users(round(users + (target_users - users) * fraction))
+                    self.set_scale(scale + (target_scale - scale) * fraction)
+                    await asyncio.sleep(min(self.update_interval, stage_end - now))
+                    now = loop.time()
+
+            self.set_users(target_users)
+            self.set_scale(target_scale)
+            await asyncio.sleep(max(0, stage_end - loop.time()))
+
+            users = target_users
+            scale = target_scale
+            stage_start = stage_end
+        metrics.set_stage(None)
@@ -0,0 +1,115 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+
+from aiohttp import web
+
+CHUNK_SIZE = 65536
+
+
+class GitHttpBackend:
+    # Serves git smart HTTP by running git http-backend as a CGI program. The
+    # request body is streamed to the process while its output is streamed to
+    # the client, so that large packs are not held in memory.
+    def __init__(self, repositories):
+        self.repositories = repositories
+
+    async def handle(self, request, path_info, before_eof=None):
+        # The coroutine function before_eof is awaited after the process has
+        # finished and before the response is completed, e.g. to process pushed
+        # refs before the client considers the push to be done.
+        env = dict(os.environ)
+        env.update(
+            {
+                "GIT_PROJECT_ROOT": self.repositories,
+                "GIT_HTTP_EXPORT_ALL": "1",
+                "PATH_INFO": path_info,
+                "REQUEST_METHOD": request.method,
+                "QUERY_STRING": request.query_string,
+                "CONTENT_TYPE": request.headers.get("Content-Type", ""),
+                "REMOTE_USER": "loadtest",
+                "REMOTE_ADDR": request.remote or "",
+                "GIT_PROTOCOL": request.headers.get("Git-Protocol", ""),
+                # Like in Gerrit, refs/for/* refs are not visible to fetches.
+                "GIT_CONFIG_PARAMETERS": "'uploadpack.hiderefs=refs/for/'",
+            }
+        )
+        # Git compresses large requests, e.g. negotiations of repositories with
+        # many refs. The request body is already decompressed by aiohttp, thus
+        # the Content-Encoding is not passed on to git http-backend.
+
+        process = await asyncio.create_subprocess_exec(
+            "git",
+            "http-backend",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=env,
+        )
+        writer = asyncio.ensure_future(self._write_body(request, process.stdin))
+        try:
+            response = await self._write_response(request, process.stdout)
+            await writer
+            await process.wait()
+            if before_eof is not None:
+                await before_eof()
+            await response.write_eof()
+        finally:
+            writer.cancel()
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            await process.wait()
+        return response
+
+    @staticmethod
+    async def _write_body(request, stdin):
+        try:
+            while True:
+                chunk = await request.content.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                stdin.write(chunk)
+                await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stdin.close()
+
+    @staticmethod
+    async def _write_response(request, stdout):
+        status = 200
+        headers = dict()
+        while True:
+            line = (await stdout.readline()).decode().rstrip("\r\n")
+            if not line:
+                break
+            name, value = line.split(":", 1)
+            if name.lower() == "status":
+                status = int(value.split()[0])
+            else:
+                headers[name] = value.strip()
+
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        while True:
+            chunk = await stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await response.write(chunk)
+        return response
@@ -0,0 +1,377 @@
+# Copyright (C) 2019 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+
+from aiohttp import web
+
+from .git_backend import GitHttpBackend
+
+JSON_PREFIX = b")]}'\n"
+SYSTEM_PROJECTS = ("All-Projects", "All-Users")
+CHANGE_ID_PATTERN = re.compile(r"^Change-Id: (I[0-9a-f]{40})\s*$", re.MULTILINE)
+GIT_SERVICES = "info/refs|git-upload-pack|git-receive-pack"
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Gerrit Stand-in",
+    "GIT_AUTHOR_EMAIL": "standin@example.com",
+    "GIT_COMMITTER_NAME": "Gerrit Stand-in",
+    "GIT_COMMITTER_EMAIL": "standin@example.com",
+}
+
+COMMIT_MSG_HOOK = b"""#!/bin/sh
+# Adds a Change-Id footer to commit messages that do not contain one yet.
+if ! grep -q "^Change-Id: I[0-9a-f]*$" "$1"; then
+  printf "\\nChange-Id: I%s\\n" \\
+    "$(head -c 20 /dev/urandom | od -An -tx1 | tr -d ' \\n')" >> "$1"
+fi
+"""
+
+
+class StandInServer:
+    # Lightweight stand-in for a Gerrit server, which implements the REST
+    # endpoints used by the actions and serves git smart HTTP. It is meant to
+    # measure the overhead of the load tester itself, not to behave like
+    # Gerrit in every detail: all changes are open and all users may do
+    # anything. Pushes to refs/for/<branch> create a change for each new commit.
+    def __init__(self, test_config):
+        self.log = logging.getLogger("ActionLogger")
+        self.config = test_config["standin"]
+        self.repositories = self.config["repositories"]
+        self.git_backend = GitHttpBackend(self.repositories)
+        self.runner = None
+
+        self.projects = dict()
+        self.accounts = dict()
+        self.changes = dict()
+        self.change_numbers = dict()
+        self.locks = dict()
+        for name in SYSTEM_PROJECTS:
+            self.projects[name] = self._project_info(name)
+        self._load_projects()
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def start(self):
+        app = web.Application(middlewares=[self._simulate])
+        app.router.add_get("/tools/hooks/commit-msg", self._handle_hook)
+        app.router.add_get("/a/projects/", self._handle_list_projects)
+        app.router.add_put("/a/projects/{project:.+}", self._handle_create_project)
+        app.router.add_put("/a/accounts/{account}", self._handle_create_account)
+        app.router.add_put(
+            "/a/accounts/{account}/password.http", self._handle_set_password
+        )
+        app.router.add_get("/a/changes/", self._handle_query_changes)
+        app.router.add_get(
+            "/a/changes/{change}/revisions/{revision}/files", self._handle_files
+        )
+        app.router.add_post(
+            "/a/changes/{change}/revisions/{revision}/review", self._handle_review
+        )
+        for prefix in ("/a", ""):
+            app.router.add_route(
+                "*",
+                "%s/{project:.+}.git/{service:%s}" % (prefix, GIT_SERVICES),
+                self._handle_git,
+            )
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, port=self.config["port"]).start()
+        self.log.info(
+            "Gerrit stand-in listening on port %d, serving %d projects from %s",
+            self.config["port"],
+            len(self.projects) - len(SYSTEM_PROJECTS),
+            self.repositories,
+        )
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    @web.middleware
+    async def _simulate(self, request, handler):
+        # Adds the configured latency and fails the configured percentage of
+        # requests, before the request is handled.
+        latency = self.config["latency"]
+        if latency["max"] > 0:
+            await asyncio.sleep(random.uniform(latency["min"], latency["max"]) / 1000)
+        if random.random() * 100 < self.config["errorRate"]:
+            return web.Response(status=503, text="Simulated error")
+        return await handler(request)
+
+    async def _handle_hook(self, _request):
+        return web.Response(body=COMMIT_MSG_HOOK)
+
+    async def _handle_list_projects(self, request):
+        # Projects are listed by name, optionally paginated.
+        names = sorted(self.projects)
+        start = int(request.query.get("S", 0))
+        limit = int(request.query.get("n", 0)) or len(names)
+        return self._json(
+            {name: self.projects[name] for name in names[start : start + limit]}
+        )
+
+    async def _handle_create_project(self, request):
+        name = request.match_info["project"]
+        if name in self.projects:
+            return web.Response(status=409, text="Project already exists")
+        options = await request.json() if request.can_read_body else dict()
+        async with self._lock(name):
+            path = self._repo_path(name)
+            await _git(self.repositories, "init", "-q", "--bare", path)
+            await _git(path, "symbolic-ref", "HEAD", "refs/heads/master")
+            await _git(path, "config", "http.receivepack", "true")
+            if str(options.get("create_empty_commit", "")).lower() == "true":
+                tree = await _git(path, "mktree", stdin=b"")
+                commit = await _git(
+                    path, "commit-tree", "-m", "Initial empty repository", tree
+                )
+                await _git(path, "update-ref", "refs/heads/master", commit)
+        self.projects[name] = self._project_info(name)
+        return self._json(self.projects[name], status=201)
+
+    async def _handle_create_account(self, request):
+        # Accounts are only kept in memory, since credentials are not checked.
+        name = request.match_info["account"]
+        if name in self.accounts:
+            return web.Response(status=409, text="Account already exists")
+        options = await request.json() if request.can_read_body else dict()
+        self.accounts[name] = {
+            "_account_id": 1000000 + len(self.accounts),
+            "name": options.get("name", name),
+            "username": name,
+        }
+        return self._json(self.accounts[name], status=201)
+
+    async def _handle_set_password(self, request):
+        if request.match_info["account"] not in self.accounts:
+            return web.Response(status=404, text="Not found")
+        options = await request.json()
+        return self._json(options["http_password"])
+
+    async def _handle_query_changes(self, request):
+        # Only open changes exist, thus the query is restricted at most by
+        # project. Changes are returned with the most recent ones first.
+        projects = re.findall(r"project:(\S+)", request.query.get("q", ""))
+        changes = [
+            change
+            for _, change in sorted(self.changes.items(), reverse=True)
+            if not projects or change["project"] in projects
+        ]
+        start = int(request.query.get("S", 0))
+        limit = int(request.query.get("n", 500))
+        options = request.query.getall("o", list())
+        result = list()
+        for change in changes[start : start + limit]:
+            info = dict(change)
+            if "CURRENT_FILES" in options:
+                files = await self._list_files(change)
+                del files["/COMMIT_MSG"]
+                info["revisions"] = {
+                    change["current_revision"]: {"_number": 1, "files": files}
+                }
+            result.append(info)
+        if result and start + limit < len(changes):
+            result[-1]["_more_changes"] = True
+        return self._json(result)
+
+    async def _handle_files(self, request):
+        change = self._find_change(request.match_info["change"])
+        if change is None:
+            return web.Response(status=404, text="Not found")
+        return self._json(await self._list_files(change))
+
+    async def _handle_review(self, request):
+        change = self._find_change(request.match_info["change"])
+        if change is None:
+            return web.Response(status=404, text="Not found")
+        review = await request.json()
+        labels = review.get("labels", dict())
+        for label, value in labels.items():
+            if label != "Code-Review" or not -2 <= value <= 2:
+                return web.Response(
+                    status=400, text="Label %s: %s not permitted" % (label, value)
+                )
+        change["updated"] = _timestamp()
+        return self._json({"labels": labels})
+
+    async def _handle_git(self, request):
+        name = request.match_info["project"]
+        service = request.match_info["service"]
+        if name not in self.projects or name in SYSTEM_PROJECTS:
+            return web.Response(status=404, text="Not found")
+        path_info = "/%s.git/%s" % (name, service)
+        if (
+            service == "info/refs"
+            and request.query.get("service") == "git-receive-pack"
+        ):
+            # The advertisement for a push must not contain refs/for/* refs of
+            # a concurrent push, which are deleted once its changes are created.
+            async with self._lock(name):
+                return await self.git_backend.handle(request, path_info)
+        if service != "git-receive-pack":
+            return await self.git_backend.handle(request, path_info)
+
+        # Pushes are serialized per project, so that the pushed refs/for/*
+        # refs can be turned into changes before the next push. Like in Gerrit,
+        # the changes exist once the push is completed.
+        async with self._lock(name):
+            return await self.git_backend.handle(
+                request, path_info, before_eof=lambda: self._create_changes(name)
+            )
+
+    async def _create_changes(self, name):
+        path = self._repo_path(name)
+        refs = await _git(
+            path, "for-each-ref", "--format=%(refname) %(objectname)", "refs/for/"
+        )
+        for line in refs.splitlines():
+            ref, tip = line.split()
+            log = await _git(
+                path,
+                "log",
+                "--reverse",
+                "--format=%H%x00%B%x00",
+                tip,
+                "--not",
+                "--branches",
+                "--glob=refs/changes/*",
+            )
+            fields = log.split("\0")
+            for commit, message in zip(fields[::2], fields[1::2]):
+                number = self._add_change(
+                    name, ref[len("refs/for/") :], commit.strip(), message
+                )
+                await _git(path, "update-ref", self._change_ref(number), commit.strip())
+            await _git(path, "update-ref", "-d", ref)
+
+    def _add_change(self, project, branch, commit, message):
+        match = CHANGE_ID_PATTERN.search(message)
+        change_id = (
+            match.group(1) if match else "I" + hashlib.sha1(commit.encode()).hexdigest()
+        )
+        number = len(self.changes) + 1
+        self.changes[number] = {
+            "id": "%s~%s~%s" % (project, branch, change_id),
+            "project": project,
+            "branch": branch,
+            "change_id": change_id,
+            "subject": message.split("\n", 1)[0],
+            "status": "NEW",
+            "created": _timestamp(),
+            "updated": _timestamp(),
+            "_number": number,
+            "current_revision": commit,
+        }
+        self.change_numbers[change_id] = number
+        self.change_numbers[self.changes[number]["id"]] = number
+        return number
+
+    async def _list_files(self, change):
+        output = await _git(
+            self._repo_path(change["project"]),
+            "diff-tree",
+            "-r",
+            "-z",
+            "--root",
+            "--no-commit-id",
+            "--no-renames",
+            "--name-status",
+            change["current_revision"],
+        )
+        fields = output.split("\0")[:-1] if output else list()
+        files = {"/COMMIT_MSG": {"status": "A"}}
+        for status, path in zip(fields[::2], fields[1::2]):
+            files[path] = {"status": status} if status != "M" else dict()
+        return files
+
+    def _find_change(self, change):
+        if change.isdigit():
+            return self.changes.get(int(change))
+        return self.changes.get(self.change_numbers.get(change))
+
+    def _load_projects(self):
+        # Repositories of earlier runs are served again.
+        os.makedirs(self.repositories, exist_ok=True)
+        for root, dirs, _ in os.walk(self.repositories):
+            for directory in list(dirs):
+                if directory.endswith(".git"):
+                    dirs.remove(directory)
+                    name = os.path.relpath(
+                        os.path.join(root, directory[:-4]), self.repositories
+                    )
+                    self.projects[name] = self._project_info(name)
+
+    def _lock(self, name):
+        if name not in self.locks:
+            self.locks[name] = asyncio.Lock()
+        return self.locks[name]
+
+    def _repo_path(self, name):
+        return os.path.join(self.repositories, "%s.git" % name)
+
+    @staticmethod
+    def _change_ref(number):
+        return "refs/changes/%02d/%d/1" % (number % 100, number)
+
+    @staticmethod
+    def _project_info(name):
+        return {"id": name.replace("/", "%2F"), "state": "ACTIVE"}
+
+    @staticmethod
+    def _json(content, status=200):
+        return web.Response(
+            status=status,
+            body=JSON_PREFIX + json.dumps(content).encode(),
+            content_type="application/json",
+        )
+
+
+def _timestamp():
+    return time.strftime("%Y-%m-%d %H:%M:%S.000000000", time.gmtime())
+
+
+async def _git(cwd, *args, stdin=None):
+    env = dict(os.environ)
+    env.update(GIT_ENV)
+    process = await asyncio.create_subprocess_exec(
+        "git",
+        *args,
+        cwd=cwd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+    )
+    stdout, stderr = await process.communicate(stdin)
+    if process.returncode != 0:
+        raise RuntimeError(
+            "git %s failed: %s" % (" ".join(args), stderr.decode().strip())
+        )
+    return stdout.decode().strip()
@@ -15,191 +15,39 @@
 # limitations under the License.
 
 import argparse
+import glob
 import logging
 import os
-import random
-import time
+import sys
 
-import numpy as np
-
-import actions
 import config
+import metrics
+import runner
+import standin
 
 LOG_PATH = "/var/logs/loadtester.log"
 
 
-class LoadTestInstance:
-    def __init__(self, test_config):
-        self.config = test_config
-        self.log = logging.getLogger("ActionLogger")
-
-        self.url = self.config["gerrit"]["url"]
-        self.user = self.config["gerrit"]["user"]
-        self.pwd = self.config["gerrit"]["password"]
-
-        self.timeout = (
-            time.time() + self.config["testrun"]["duration"]
-            if self.config["testrun"]["duration"]
-            else None
-        )
-
-        self.action_config = self.config["actions"]
-
-        self.owned_projects = set()
-        if self.config["testrun"]["initialization"]["knownProjects"]:
-            self.owned_projects = set(
-                self.config["testrun"]["initialization"]["knownProjects"]
-            )
-
-        self.cloned_projects = set()
-
-    def prerun(self):
-        if self.config["testrun"]["initialization"]["delay"]["enabled"]:
-            self._wait_random_seconds(
-                self.config["testrun"]["initialization"]["delay"]["min"],
-                self.config["testrun"]["initialization"]["delay"]["max"],
-            )
-
-        if self.config["testrun"]["initialization"]["createProjects"]["enabled"]:
-            self._create_initial_projects(
-                self.config["testrun"]["initialization"]["createProjects"]["number"]
-            )
-
-    def run(self):
-        while True:
-            if self.timeout and time.time() >= self.timeout:
-                break
-
-            if self.config["testrun"]["waitBetweenCycles"]["enabled"]:
-                self._wait_random_seconds(
-                    self.config["testrun"]["waitBetweenCycles"]["min"],
-                    self.config["testrun"]["waitBetweenCycles"]["max"],
-                )
-
-            self._exec_create_project_action()
-            self._exec_list_projects_action()
-
-            if self.owned_projects:
-                self._exec_clone_project_action()
-
-            if self.cloned_projects:
-                self._exec_fetch_project_action()
-                self._exec_push_head_to_master_action()
-                self._exec_push_change_action()
-
-            self._exec_query_hundred_open_changes_action()
-            self._exec_review_change_action()
-
-    def _create_initial_projects(self, num_init_projects):
-        for _ in range(num_init_projects):
-            self.owned_projects.add(
-                actions.CreateProjectAction(
-                    self.url, self.user, self.pwd, 1.0
-                ).execute()
-            )
-
-    def _wait_random_seconds(self, min_wait, max_wait):
-        wait_duration = random.randint(min_wait, max_wait)
-        self.log.info("Waiting for %d seconds.", wait_duration)
-        time.sleep(wait_duration)
-
-    @staticmethod
-    def _choose_from_list_poisson(input_list):
-        probabilities = np.random.poisson(20, len(input_list))
-        probabilities = probabilities / np.sum(probabilities)
-        return np.random.choice(input_list, 1, p=probabilities).tolist()[0]
-
-    def _exec_create_project_action(self):
-        action = actions.CreateProjectAction(
-            self.url,
-            self.user,
-            self.pwd,
-            self.action_config["create_project"]["probability"],
-        )
-        project_name = action.execute()
-        if not action.failed and project_name:
-            self.owned_projects.add(project_name)
-
-    def _exec_list_projects_action(self):
-        action = actions.QueryProjectsAction(
-            self.url,
-            self.user,
-            self.pwd,
-            self.action_config["query_projects"]["probability"],
-        )
-        project_name = action.execute()
-        if not action.failed and project_name:
-            self.owned_projects.add(project_name)
-
-    def _exec_clone_project_action(self):
-        action = actions.CloneProjectAction(
-            self.url,
-            self.user,
-            self.pwd,
-            self._choose_from_list_poisson(list(self.owned_projects)),
-            self.action_config["clone_project"]["probability"],
-        )
-        action.execute()
-        if not action.failed and action.was_executed:
-            self.cloned_projects.add(action.project_name)
-
-    def _exec_fetch_project_action(self):
-        action = actions.FetchProjectAction(
-            self._choose_from_list_poisson(list(self.cloned_projects)),
-            self.action_config["fetch_project"]["probability"],
-        )
-        action.execute()
-
-    def _exec_push_head_to_master_action(self):
-        action = actions.PushHeadToMasterAction(
-            self._choose_from_list_poisson(list(self.cloned_projects)),
-            self.action_config["push_head_to_master"]["probability"],
-        )
-        action.execute()
-
-    def _exec_push_change_action(self):
-        action = actions.PushForReviewAction(
-            self._choose_from_list_poisson(list(self.cloned_projects)),
-            self.action_config["push_for_review"]["probability"],
-        )
-        action.execute()
-
-    def _exec_query_hundred_open_changes_action(self):
-        action = actions.QueryHundredOpenChanges(
-            self.url,
-            self.user,
-            self.pwd,
-            self.action_config["query_hundred_open_changes"]["probability"],
-        )
-        action.execute()
-
-    def _exec_review_change_action(self):
-        action = actions.ReviewChangeAction(
-            self.url,
-            self.user,
-            self.pwd,
-            self.action_config["review_change"]["probability"],
-        )
-        action.execute()
-
-
 # pylint: disable=C0103
 if __name__ == "__main__":
 
-    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-
-    log_format = "%(asctime)s %(message)s"
-
-    logging.basicConfig(
-        level=logging.DEBUG, format=log_format, filename=LOG_PATH, filemode="w"
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "command",
+        help="Command to execute (default: run)",
+        nargs="?",
+        choices=[
+            "run",
+            "report",
+            "coordinator",
+            "worker",
+            "standin",
+            "benchmark",
+            "generate",
+        ],
+        default="run",
     )
 
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.DEBUG)
-    handler.setFormatter(logging.Formatter(log_format))
-    logging.getLogger("ActionLogger").addHandler(handler)
-
-    parser = argparse.ArgumentParser()
     parser.add_argument(
         "-U", "--url", help="Gerrit base url", dest="url", action="store"
     )
@@ -223,8 +71,110 @@ if __name__ == "__main__":
         "-c", "--config", help="Configuration file", dest="config_file", action="store"
     )
 
+    parser.add_argument(
+        "-n",
+        "--users",
+        help="Number of simulated users run in this process",
+        dest="users",
+        action="store",
+        type=int,
+    )
+
+    parser.add_argument(
+        "-r",
+        "--results",
+        help="Results files or directories to create a report from",
+        dest="results",
+        action="store",
+        nargs="+",
+        default=list(),
+    )
+
+    parser.add_argument(
+        "-i",
+        "--interval",
+        help="Length of the intervals of the report time series in seconds",
+        dest="interval",
+        action="store",
+        type=int,
+        default=60,
+    )
+
+    parser.add_argument(
+        "--coordinator",
+        help="Address (host:port) of the coordinator a worker connects to",
+        dest="coordinator",
+        action="store",
+    )
+
+    parser.add_argument(
+        "--workers",
+        help="Number of workers the coordinator waits for",
+        dest="workers",
+        action="store",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--local-workers",
+        help="Number of workers the coordinator starts on the local machine",
+        dest="local_workers",
+        action="store",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--save-baseline",
+        help="Store the results of the benchmark as new baseline",
+        dest="save_baseline",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--log-file",
+        help="Path of the log file",
+        dest="log_file",
+        action="store",
+        default=LOG_PATH,
+    )
+
     args = parser.parse_args()
 
-    test = LoadTestInstance(config.Parser(args).parse())
-    test.prerun()
-    test.run()
+    os.makedirs(os.path.dirname(args.log_file), exist_ok=True)
+
+    log_format = "%(asctime)s %(message)s"
+
+    logging.basicConfig(
+        level=logging.DEBUG, format=log_format, filename=args.log_file, filemode="w"
+    )
+
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter(log_format))
+    logging.getLogger("ActionLogger").addHandler(handler)
+
+    if args.command == "report":
+        result_files = list()
+        for path in args.results:
+            if os.path.isdir(path):
+                result_files.extend(sorted(glob.glob(os.path.join(path, "*.bin"))))
+            else:
+                result_files.append(path)
+        print("\n".join(metrics.Report(result_files, args.interval).generate()))
+    elif args.command == "coordinator":
+        runner.Coordinator(config.Parser(args).parse(), args.log_file).run()
+    elif args.command == "worker":
+        runner.Worker(args.coordinator).run()
+    elif args.command == "standin":
+        standin.StandInServer(config.Parser(args).parse()).run()
+    elif args.command == "benchmark":
+        benchmark = runner.ClientBenchmark(
+            config.Parser(args).parse(), args.save_baseline
+        )
+        if not benchmark.run():
+            sys.exit(1)
+    elif args.command == "generate":
+        runner.RepositoryGenerator(config.Parser(args).parse()).run()
+    else:
+        test = runner.LoadTestEngine(config.Parser(args).parse())
+        test.run()